@@ -1,2 +1,3 @@
 # backend/auth/__init__.py
-from .router import router
+# Import the router from auth.router; keeping this empty means loading auth.cache or
+# auth.utils does not also build the APIRouter.
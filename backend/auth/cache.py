@@ -0,0 +1,125 @@
+# backend/auth/cache.py
+import hashlib
+import time
+from typing import Optional
+
+import orjson
+from cachetools import TTLCache
+
+from core.config import REDIS_URL, logger
+
+try:
+    import redis.asyncio as aioredis
+    from redis.exceptions import RedisError
+except ImportError:  # optional: only needed when REDIS_URL is set
+    aioredis = None
+    RedisError = Exception
+
+# 🔐 Cache Config
+TOKEN_CACHE_MAXSIZE = 50_000
+TOKEN_CACHE_TTL = 300  # seconds
+REDIS_TOKEN_PREFIX = "authgate:tokens:"
+
+# ------------------------
+# TOKEN CACHE
+# ------------------------
+class TokenCache:
+    """
+    In-process cache keyed by a hash of a validated JWT (decoded claims or user documents).
+    Entries live for min(token exp, TOKEN_CACHE_TTL) so a cache hit never
+    outlives the token it was derived from.
+    """
+
+    def __init__(self, maxsize: int = TOKEN_CACHE_MAXSIZE, ttl: int = TOKEN_CACHE_TTL):
+        self.ttl = ttl
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    @staticmethod
+    def key(token: str) -> bytes:
+        """Hash the raw token so the cache never holds bearer credentials."""
+        return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+    def get(self, key: bytes) -> Optional[dict]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        user, exp_ts = entry
+        if exp_ts <= time.time():
+            self._cache.pop(key, None)
+            return None
+        return user
+
+    def set(self, key: bytes, user: dict, exp_ts: float) -> None:
+        self._cache[key] = (user, min(exp_ts, time.time() + self.ttl))
+
+    def pop(self, key: bytes) -> None:
+        self._cache.pop(key, None)
+
+
+# ------------------------
+# SHARED (REDIS) TOKEN CACHE
+# ------------------------
+class RedisTokenCache:
+    """
+    Second-level cache shared by every worker and replica, so a token validated
+    by one process is not re-validated against Mongo by the others.
+    Disabled (every call a no-op miss) when REDIS_URL is unset or redis is missing;
+    Redis errors are logged and treated as misses.
+    """
+
+    def __init__(self, url: str = "", ttl: int = TOKEN_CACHE_TTL):
+        self.ttl = ttl
+        self._client = None
+        if url and aioredis is None:
+            logger.warning("REDIS_URL is set but the redis package is not installed; shared token cache disabled")
+        elif url:
+            self._client = aioredis.from_url(url)
+
+    @staticmethod
+    def _name(key: bytes) -> str:
+        return REDIS_TOKEN_PREFIX + key.hex()
+
+    async def get(self, key: bytes) -> Optional[tuple[dict, float]]:
+        """Return (user, exp_ts) or None."""
+        if self._client is None:
+            return None
+        try:
+            raw = await self._client.get(self._name(key))
+        except RedisError as e:
+            logger.warning("Redis token cache get failed: %s", e)
+            return None
+        if raw is None:
+            return None
+        entry = orjson.loads(raw)
+        return entry["user"], entry["exp"]
+
+    async def set(self, key: bytes, user: dict, exp_ts: float) -> None:
+        if self._client is None:
+            return
+        ttl = int(min(exp_ts - time.time(), self.ttl))
+        if ttl <= 0:
+            return
+        # default=str covers ObjectId _ids of legacy accounts
+        raw = orjson.dumps({"user": user, "exp": exp_ts}, default=str)
+        try:
+            await self._client.setex(self._name(key), ttl, raw)
+        except RedisError as e:
+            logger.warning("Redis token cache set failed: %s", e)
+
+    async def delete(self, key: bytes) -> None:
+        if self._client is None:
+            return
+        try:
+            await self._client.delete(self._name(key))
+        except RedisError as e:
+            logger.warning("Redis token cache delete failed: %s", e)
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+
+
+# Shared instances for global import
+token_cache = TokenCache()  # token -> user document (per process, L1)
+shared_token_cache = RedisTokenCache(REDIS_URL)  # token -> user document (cross-worker, L2)
+decoded_token_cache = TokenCache(maxsize=10_000)  # token -> verified claims
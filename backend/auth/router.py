@@ -1,33 +1,48 @@
 # backend/auth/router.py
 from fastapi import APIRouter, Depends, HTTPException, status
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, constr
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from motor.motor_asyncio import AsyncIOMotorClient
-from datetime import datetime, timedelta
+from pymongo.errors import DuplicateKeyError
+import uuid
+from bson import ObjectId
+from datetime import datetime, timedelta, timezone
 
 from auth.utils import (
-    verify_password,
+    verify_and_update_password,
     get_password_hash,
     create_access_token,
     decode_access_token,
 )
+from auth.cache import token_cache, shared_token_cache
 from core.config import logger
+from core.database import database_manager
 
 # ------------------------
 # SETUP
 # ------------------------
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 security = HTTPBearer()
-client = AsyncIOMotorClient("mongodb://localhost:27017")
-db = client.smart_parking
-users_col = db.users
+optional_security = HTTPBearer(auto_error=False)
+
+# Only fetch what each path actually reads
+LOGIN_FIELDS = {"_id": 1, "email": 1, "hashed_password": 1}
+CURRENT_USER_FIELDS = {"_id": 1, "email": 1, "role": 1}
+
+def _users():
+    """Users collection on the shared, pooled Mongo client."""
+    return database_manager.db.users
 
 # ------------------------
 # SCHEMAS
 # ------------------------
 class UserIn(BaseModel):
     email: EmailStr
-    password: str
+    # Bounded so oversized inputs are rejected before any bcrypt work
+    password: constr(min_length=8, max_length=128)
+
+class LoginIn(BaseModel):
+    email: EmailStr
+    password: constr(max_length=128)  # no minimum: older accounts may have shorter passwords
 
 class UserOut(BaseModel):
     id: str
@@ -42,13 +57,28 @@ class Token(BaseModel):
 # ------------------------
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     token = credentials.credentials
+    cache_key = token_cache.key(token)
+    cached = token_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    shared = await shared_token_cache.get(cache_key)
+    if shared is not None:
+        user, exp_ts = shared
+        token_cache.set(cache_key, user, exp_ts)
+        return user
+
     payload = decode_access_token(token)
     user_id = payload.get("user_id")
     if not user_id:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload")
-    user = await users_col.find_one({"_id": user_id})
+    user = await _users().find_one({"_id": user_id}, projection=CURRENT_USER_FIELDS)
+    if not user and ObjectId.is_valid(user_id):
+        # Accounts registered before string ids still carry an ObjectId _id
+        user = await _users().find_one({"_id": ObjectId(user_id)}, projection=CURRENT_USER_FIELDS)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    token_cache.set(cache_key, user, payload.get("exp", 0))
+    await shared_token_cache.set(cache_key, user, payload.get("exp", 0))
     return user
 
 # ------------------------
@@ -56,29 +86,48 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
 # ------------------------
 @router.post("/register", response_model=UserOut)
 async def register(user_in: UserIn):
-    existing = await users_col.find_one({"email": user_in.email})
-    if existing:
+    hashed_pw = await get_password_hash(user_in.password)
+    # String _id matches the JWT user_id claim, so lookups need no ObjectId round-trip
+    user_doc = {
+        "_id": str(uuid.uuid4()),
+        "email": user_in.email,
+        "hashed_password": hashed_pw,
+        "created_at": datetime.now(timezone.utc),
+    }
+    # Unique index on email makes the insert itself the duplicate check
+    try:
+        res = await _users().insert_one(user_doc)
+    except DuplicateKeyError:
         raise HTTPException(status_code=400, detail="Email already registered")
-    hashed_pw = get_password_hash(user_in.password)
-    user_doc = {"email": user_in.email, "hashed_password": hashed_pw, "created_at": datetime.utcnow()}
-    res = await users_col.insert_one(user_doc)
-    logger.info(f"🧾 New user registered: {user_in.email}")
-    return UserOut(id=str(res.inserted_id), email=user_in.email)
+    logger.info("New user registered: %s", user_in.email)
+    return UserOut(id=res.inserted_id, email=user_in.email)
 
 @router.post("/login", response_model=Token)
-async def login(user_in: UserIn):
-    user = await users_col.find_one({"email": user_in.email})
-    if not user or not verify_password(user_in.password, user["hashed_password"]):
+async def login(user_in: LoginIn):
+    user = await _users().find_one({"email": user_in.email}, projection=LOGIN_FIELDS)
+    if not user:
+        raise HTTPException(status_code=400, detail="Incorrect email or password")
+    valid, new_hash = await verify_and_update_password(user_in.password, user["hashed_password"])
+    if not valid:
         raise HTTPException(status_code=400, detail="Incorrect email or password")
-    token_data = {"user_id": str(user["_id"]), "email": user["email"]}
+    if new_hash:
+        await _users().update_one({"_id": user["_id"]}, {"$set": {"hashed_password": new_hash}})
+    user_id = user["_id"]
+    if not isinstance(user_id, str):
+        user_id = str(user_id)  # legacy ObjectId account
+    token_data = {"user_id": user_id, "email": user["email"]}
     token = create_access_token(token_data)
-    logger.info(f"✅ Login successful for {user_in.email}")
+    logger.info("Login successful for %s", user_in.email)
     return {"access_token": token, "token_type": "bearer"}
 
 @router.post("/logout")
-async def logout():
+async def logout(credentials: HTTPAuthorizationCredentials | None = Depends(optional_security)):
     """
     Since JWT is stateless, we can't invalidate tokens server-side without a blacklist.
-    The frontend should simply delete the token.
+    The frontend should simply delete the token; we only drop it from the validation cache.
     """
+    if credentials:
+        cache_key = token_cache.key(credentials.credentials)
+        token_cache.pop(cache_key)
+        await shared_token_cache.delete(cache_key)
     return {"message": "User logged out"}
@@ -1,26 +1,139 @@
 # backend/auth/utils.py
-import jwt
-from datetime import datetime, timedelta
-from passlib.context import CryptContext
+import asyncio
+import base64
+import binascii
+import bcrypt
+import hmac
+import secrets
+import ssl
+import time
+import orjson
+from datetime import timedelta
 from fastapi import HTTPException, status
 from typing import Optional
-from core.config import logger
+from auth.cache import decoded_token_cache
+from core.config import ENVIRONMENT, SECRET_KEY as _ENV_SECRET_KEY, logger
 
 # 🔐 Security Config
-SECRET_KEY = "YOUR_SECRET_KEY"  # move to .env for safety
+SECRET_KEY = _ENV_SECRET_KEY
+if not SECRET_KEY:
+    # Every worker (and every restart) would sign with a different key, so only development may go without
+    if ENVIRONMENT != "development":
+        raise RuntimeError("SECRET_KEY must be set when ENVIRONMENT is not 'development'")
+    logger.warning("SECRET_KEY not set; using a random per-process signing key (development only)")
+    SECRET_KEY = secrets.token_urlsafe(32)
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+BCRYPT_ROUNDS = 10  # p95 verify well under 100 ms; 12 (passlib default) is ~4x slower
+BCRYPT_MAX_PASSWORD_BYTES = 72  # bcrypt only reads this many bytes; longer input is truncated
 
 # ------------------------
 # PASSWORD HELPERS
 # ------------------------
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+# bcrypt is the only scheme we store, so call it directly instead of via a policy context
+def _password_bytes(password: str) -> bytes:
+    return password.encode("utf-8")[:BCRYPT_MAX_PASSWORD_BYTES]
 
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+def _hash_password(password: str) -> str:
+    return bcrypt.hashpw(_password_bytes(password), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode("ascii")
+
+def _check_password(plain_password: str, hashed_password: str) -> bool:
+    try:
+        return bcrypt.checkpw(_password_bytes(plain_password), hashed_password.encode("ascii"))
+    except ValueError:  # not a bcrypt hash
+        return False
+
+def _needs_rehash(hashed_password: str) -> bool:
+    # Modular crypt format: $2b$<rounds>$<salt+digest>
+    try:
+        return int(hashed_password.split("$")[2]) > BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return False
+
+def _verify_and_update(plain_password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    if not _check_password(plain_password, hashed_password):
+        return False, None
+    if _needs_rehash(hashed_password):
+        return True, _hash_password(plain_password)
+    return True, None
+
+# bcrypt is CPU-bound; run it on worker threads so the event loop keeps serving requests
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await asyncio.to_thread(_check_password, plain_password, hashed_password)
+
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    """Verify and return a replacement hash when the stored one uses a higher bcrypt cost."""
+    return await asyncio.to_thread(_verify_and_update, plain_password, hashed_password)
+
+async def get_password_hash(password: str) -> str:
+    return await asyncio.to_thread(_hash_password, password)
+
+# ------------------------
+# HS256 CODEC
+# ------------------------
+# HS256 is the only algorithm we issue, so its JOSE header is a constant:
+# base64url('{"alg":"HS256","typ":"JWT"}')
+_JWT_HEADER_B64 = b"eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9"
+
+class InvalidTokenError(Exception):
+    """Token is malformed, uses another algorithm, or has a bad signature."""
+
+class ExpiredSignatureError(InvalidTokenError):
+    """Token signature is valid but its exp claim has passed."""
+
+def _b64url_encode(raw: bytes) -> bytes:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=")
+
+def _b64url_decode(segment: bytes) -> bytes:
+    return base64.urlsafe_b64decode(segment + b"=" * (-len(segment) % 4))
+
+# Key encoded and HMAC inner/outer pads computed once; each signature starts from a copy.
+# Naming the digest as a string routes hmac.new straight to OpenSSL's HMAC, which uses
+# SHA-NI on x86 and the ARMv8 SHA2 extensions on Graviton. The runtime image must link
+# OpenSSL >= 1.1.1 for that path; without it hmac falls back to its pure-Python wrapper.
+_HS256_KEY = SECRET_KEY.encode("utf-8")
+_HS256_BASE = hmac.new(_HS256_KEY, digestmod="sha256")
+if getattr(_HS256_BASE, "_hmac", None) is None:
+    logger.warning("hmac is not OpenSSL-backed (%s); HS256 signing will be slow", ssl.OPENSSL_VERSION)
+
+def _sign(signing_input: bytes) -> bytes:
+    mac = _HS256_BASE.copy()
+    mac.update(signing_input)
+    return mac.digest()
+
+def _jwt_encode(claims: dict) -> str:
+    payload = orjson.dumps(claims)
+    signing_input = _JWT_HEADER_B64 + b"." + _b64url_encode(payload)
+    return (signing_input + b"." + _b64url_encode(_sign(signing_input))).decode()
+
+def _jwt_decode(token: str) -> dict:
+    try:
+        signing_input, signature = token.encode().rsplit(b".", 1)
+        header, payload = signing_input.split(b".")
+    except ValueError:
+        raise InvalidTokenError("Malformed token")
+    if header != _JWT_HEADER_B64:
+        raise InvalidTokenError("Unsupported token header")
+    try:
+        signature_ok = hmac.compare_digest(_b64url_decode(signature), _sign(signing_input))
+    except binascii.Error:
+        raise InvalidTokenError("Malformed signature")
+    if not signature_ok:
+        raise InvalidTokenError("Signature verification failed")
+    try:
+        claims = orjson.loads(_b64url_decode(payload))
+    except (binascii.Error, orjson.JSONDecodeError):
+        raise InvalidTokenError("Malformed payload")
+    if not isinstance(claims, dict):
+        raise InvalidTokenError("Malformed payload")
+    exp = claims.get("exp")
+    if exp is not None:
+        if not isinstance(exp, (int, float)):
+            raise InvalidTokenError("Invalid exp claim")
+        if exp <= time.time():
+            raise ExpiredSignatureError("Signature has expired")
+    return claims
 
 # ------------------------
 # JWT HELPERS
@@ -28,18 +141,23 @@ def get_password_hash(password: str) -> str:
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Generate JWT token with expiry"""
     to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})
-    token = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    lifetime = int(expires_delta.total_seconds()) if expires_delta else ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    to_encode["exp"] = int(time.time()) + lifetime  # RFC 7519 NumericDate
+    token = _jwt_encode(to_encode)
     return token
 
 def decode_access_token(token: str) -> dict:
     """Decode JWT and return payload or raise HTTPException"""
+    cache_key = decoded_token_cache.key(token)
+    payload = decoded_token_cache.get(cache_key)
+    if payload is not None:
+        return payload
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = _jwt_decode(token)
+        decoded_token_cache.set(cache_key, payload, payload.get("exp", 0))
         return payload
-    except jwt.ExpiredSignatureError:
+    except ExpiredSignatureError:
         logger.warning("JWT expired")
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token expired")
-    except jwt.PyJWTError:
+    except InvalidTokenError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
@@ -8,6 +8,20 @@ load_dotenv()
 # ---- Configuration ----
 GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY", "")
 MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
+SECRET_KEY = os.getenv("SECRET_KEY", "")
+ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
+REDIS_URL = os.getenv("REDIS_URL", "")  # optional shared token cache
+SEED_DB = os.getenv("SEED_DB") == "1"  # on startup: regenerate sensor_data, insert missing sample lots/users
+DRIVE_TIME_CACHE_TTL = int(os.getenv("DRIVE_TIME_CACHE_TTL", "600"))  # seconds a Google duration is reused
+MAX_DECOMPRESSED_BODY = int(os.getenv("MAX_DECOMPRESSED_BODY", str(1 << 20)))  # bytes a gzip request may inflate to
+
+# ---- WebSocket ----
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "100"))  # messages a client may fall behind by before it is dropped
+
+# ---- Demand model (GMM) ----
+GMM_MODEL_PATH = os.getenv(
+    "GMM_MODEL_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "ml", "gmm.joblib")
+)
 
 # ---- Logging ----
 logging.basicConfig(level=logging.INFO)
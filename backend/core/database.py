@@ -1,145 +1,70 @@
 # backend/core/database.py
 import asyncio
-import motor.motor_asyncio
-from pymongo import GEOSPHERE
-from datetime import datetime
+from pymongo import ASCENDING, DESCENDING, GEOSPHERE, AsyncMongoClient, IndexModel, UpdateOne
+from pymongo.errors import CollectionInvalid, OperationFailure
+from datetime import datetime, timezone
 import logging
+from typing import Optional
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("smart_parking_db")
 
-class DatabaseManager:
-    """MongoDB database manager for Smart Parking System"""
-
-    def __init__(self, mongodb_url="mongodb://localhost:27017", database_name="smart_parking"):
-        self.mongodb_url = mongodb_url
-        self.database_name = database_name
-        self.client = None
-        self.db = None
-
-    async def connect(self):
-        """Connect to MongoDB"""
-        try:
-            self.client = motor.motor_asyncio.AsyncIOMotorClient(self.mongodb_url)
-            self.db = self.client[self.database_name]
-
-            await self.client.admin.command("ping")
-            logger.info(f"✅ Connected to MongoDB: {self.database_name}")
-
-            await self.safe_reset_collections()
-            await self.create_indexes()
-
-        except Exception as e:
-            logger.error(f"❌ Failed to connect to MongoDB: {e}")
-            raise
-
-    async def disconnect(self):
-        """Disconnect from MongoDB"""
-        if self.client:
-            self.client.close()
-            logger.info("🔌 Disconnected from MongoDB")
-
-    async def safe_reset_collections(self):
-        """Drop outdated or conflicting collections"""
-        collections_to_reset = ["reservations"]
-        for name in collections_to_reset:
-            try:
-                await self.db.drop_collection(name)
-                logger.info(f"🧹 Dropped old collection: {name}")
-            except Exception as e:
-                logger.warning(f"⚠️ Could not drop collection {name}: {e}")
-
-    async def create_indexes(self):
-        """Create necessary indexes for collections"""
-        try:
-            for collection_name in [
-                "parking_lots",
-                "reservations",
-                "sensor_data",
-                "optimization_logs",
-                "device_heartbeats",
-            ]:
-                try:
-                    await self.db[collection_name].drop_indexes()
-                except Exception:
-                    pass
-
-            await self.db.parking_lots.create_index("lot_id", unique=True)
-            await self.db.parking_lots.create_index([("location", GEOSPHERE)])
-
-            await self.db.reservations.create_index("reservation_id", unique=True)
-            await self.db.reservations.create_index("user_id")
-            await self.db.reservations.create_index("lot_id")
-            await self.db.reservations.create_index("status")
-
-            await self.db.sensor_data.create_index("slot_id")
-            await self.db.sensor_data.create_index("lot_id")
-            await self.db.sensor_data.create_index("timestamp")
-
-            await self.db.optimization_logs.create_index("timestamp")
-            await self.db.optimization_logs.create_index("status")
-
-            await self.db.device_heartbeats.create_index("device_id")
-            await self.db.device_heartbeats.create_index("timestamp")
-
-            logger.info("✅ MongoDB indexes created successfully")
-
-        except Exception as e:
-            logger.error(f"❌ Index creation failed: {e}")
-
-    async def initialize_sample_data(self):
-        """Initialize the DB with default Bengaluru sample data"""
-        try:
-            for col in ["parking_lots", "sensor_data", "users"]:
-                await self.db[col].delete_many({})
-
-            parking_lots = [
-                {
-                    "lot_id": "lot_001",
-                    "name": "MG Road Parking Complex",
-                    "location": {"lat": 12.9716, "lng": 77.5946},
-                    "address": "MG Road, Bengaluru, Karnataka",
-                    "total_slots": 60,
-                    "reserved_slots": 10,
-                    "competitive_slots": 45,
-                    "occupied_slots": 5,
-                    "hourly_rate": 40.0,
-                    "features": ["covered", "security", "EV charging"],
-                    "created_at": datetime.now(),
-                    "updated_at": datetime.now(),
-                },
-                {
-                    "lot_id": "lot_002",
-                    "name": "Koramangala 1st Block Parking",
-                    "location": {"lat": 12.9352, "lng": 77.6245},
-                    "address": "Koramangala, Bengaluru, Karnataka",
-                    "total_slots": 90,
-                    "reserved_slots": 20,
-                    "competitive_slots": 65,
-                    "occupied_slots": 5,
-                    "hourly_rate": 30.0,
-                    "features": ["open", "security"],
-                    "created_at": datetime.now(),
-                    "updated_at": datetime.now(),
-                },
-                {
-                    "lot_id": "lot_003",
-                    "name": "Whitefield Forum Value Mall Parking",
-                    "location": {"lat": 12.9692, "lng": 77.7496},
-                    "address": "Forum Value Mall, Whitefield, Bengaluru, Karnataka",
-                    "total_slots": 120,
-                    "reserved_slots": 30,
-                    "competitive_slots": 80,
-                    "occupied_slots": 10,
-                    "hourly_rate": 35.0,
-                    "features": ["covered", "security", "mall access"],
-                    "created_at": datetime.now(),
-                    "updated_at": datetime.now(),
-                },
-                    {
+SENSOR_INSERT_BATCH = 1000
+BULK_INSERT_CONCURRENCY = 2
+
+MONGO_CLIENT_OPTIONS = {
+    "maxPoolSize": 200,
+    "minPoolSize": 20,
+    "maxIdleTimeMS": 30000,
+    "compressors": "zstd,zlib",  # negotiated with the server; zstd needs the zstandard package
+    "w": 1,
+    "retryWrites": True,
+    "serverSelectionTimeoutMS": 3000,
+}
+DATA_RETENTION_DAYS = 30  # sensor readings, optimization logs and heartbeats
+
+# Default Bengaluru sample data; timestamps are added at seed time
+_LOT_TEMPLATES = (
+    {
+        "lot_id": "lot_001",
+        "name": "MG Road Parking Complex",
+        "location": {"lat": 12.9716, "lng": 77.5946},
+        "address": "MG Road, Bengaluru, Karnataka",
+        "total_slots": 60,
+        "reserved_slots": 10,
+        "competitive_slots": 45,
+        "occupied_slots": 5,
+        "hourly_rate": 40.0,
+        "features": ["covered", "security", "EV charging"],
+    },
+    {
+        "lot_id": "lot_002",
+        "name": "Koramangala 1st Block Parking",
+        "location": {"lat": 12.9352, "lng": 77.6245},
+        "address": "Koramangala, Bengaluru, Karnataka",
+        "total_slots": 90,
+        "reserved_slots": 20,
+        "competitive_slots": 65,
+        "occupied_slots": 5,
+        "hourly_rate": 30.0,
+        "features": ["open", "security"],
+    },
+    {
+        "lot_id": "lot_003",
+        "name": "Whitefield Forum Value Mall Parking",
+        "location": {"lat": 12.9692, "lng": 77.7496},
+        "address": "Forum Value Mall, Whitefield, Bengaluru, Karnataka",
+        "total_slots": 120,
+        "reserved_slots": 30,
+        "competitive_slots": 80,
+        "occupied_slots": 10,
+        "hourly_rate": 35.0,
+        "features": ["covered", "security", "mall access"],
+    },
+    {
         "lot_id": "lot_004",
         "name": "Brigade Road Parking Lot",
-        "location": {"lat": 12.9719, "lng": 77.6070},
+        "location": {"lat": 12.9719, "lng": 77.607},
         "address": "Brigade Road, Bengaluru",
         "total_slots": 100,
         "reserved_slots": 15,
@@ -147,13 +72,11 @@ class DatabaseManager:
         "occupied_slots": 10,
         "hourly_rate": 40.0,
         "features": ["covered", "security"],
-        "created_at": datetime.now(),
-        "updated_at": datetime.now(),
     },
     {
         "lot_id": "lot_005",
         "name": "Church Street Parking Hub",
-        "location": {"lat": 12.9750, "lng": 77.6030},
+        "location": {"lat": 12.975, "lng": 77.603},
         "address": "Church Street, Bengaluru",
         "total_slots": 80,
         "reserved_slots": 12,
@@ -161,8 +84,6 @@ class DatabaseManager:
         "occupied_slots": 8,
         "hourly_rate": 35.0,
         "features": ["open", "security"],
-        "created_at": datetime.now(),
-        "updated_at": datetime.now(),
     },
     {
         "lot_id": "lot_006",
@@ -175,8 +96,6 @@ class DatabaseManager:
         "occupied_slots": 10,
         "hourly_rate": 30.0,
         "features": ["open", "security"],
-        "created_at": datetime.now(),
-        "updated_at": datetime.now(),
     },
     {
         "lot_id": "lot_007",
@@ -189,13 +108,11 @@ class DatabaseManager:
         "occupied_slots": 10,
         "hourly_rate": 25.0,
         "features": ["covered", "security"],
-        "created_at": datetime.now(),
-        "updated_at": datetime.now(),
     },
     {
         "lot_id": "lot_008",
         "name": "BTM Layout Parking Zone",
-        "location": {"lat": 12.9155, "lng": 77.6100},
+        "location": {"lat": 12.9155, "lng": 77.61},
         "address": "BTM Layout, Bengaluru",
         "total_slots": 120,
         "reserved_slots": 22,
@@ -203,95 +120,322 @@ class DatabaseManager:
         "occupied_slots": 13,
         "hourly_rate": 30.0,
         "features": ["open", "security"],
-        "created_at": datetime.now(),
-        "updated_at": datetime.now(),
     },
+)
 
-            ]
+_USER_TEMPLATES = (
+    {
+        "user_id": "user_001",
+        "name": "John Doe",
+        "email": "john@example.com",
+        "phone": "+91-9876543210",
+        "role": "user",
+    },
+    {
+        "user_id": "admin_001",
+        "name": "Admin User",
+        "email": "admin@parking.in",
+        "phone": "+91-9123456780",
+        "role": "admin",
+        "permissions": ["read", "write", "admin"],
+    },
+)
+
+# (lot_id, total_slots, device_id) so the sensor loop does no per-slot dict lookups
+_SENSOR_LOTS = tuple(
+    (lot["lot_id"], lot["total_slots"], f"device_{lot['lot_id']}") for lot in _LOT_TEMPLATES
+)
+
+# Compound (key, timestamp desc) indexes also serve equality-only lookups on their prefix
+_INDEX_MODELS = {
+    "parking_lots": [
+        IndexModel("lot_id", unique=True),
+        IndexModel([("location", GEOSPHERE)]),
+    ],
+    "reservations": [
+        IndexModel("reservation_id", unique=True),
+        IndexModel([("user_id", ASCENDING), ("start_time", DESCENDING)]),
+        IndexModel("lot_id"),
+        IndexModel("status"),
+    ],
+    # Time series: readings carry their identifiers under "meta"; the time field needs no index
+    # (regular collections from older deployments get _REGULAR_SENSOR_INDEXES instead)
+    "sensor_data": [
+        IndexModel([("meta.lot_id", ASCENDING), ("timestamp", DESCENDING)]),
+        IndexModel([("meta.slot_id", ASCENDING), ("timestamp", DESCENDING)]),
+    ],
+    "users": [
+        IndexModel("email", unique=True),
+        IndexModel("user_id", unique=True, sparse=True),
+    ],
+    # TTL indexes: MongoDB's TTL monitor expires old documents server-side
+    "optimization_logs": [
+        IndexModel("timestamp", name="timestamp_ttl", expireAfterSeconds=DATA_RETENTION_DAYS * 86400),
+        # latest completed run: equality on status, then walk timestamp newest-first (no sort stage)
+        IndexModel([("status", ASCENDING), ("timestamp", DESCENDING)]),
+    ],
+    "device_heartbeats": [
+        IndexModel("device_id"),
+        IndexModel("timestamp", name="timestamp_ttl", expireAfterSeconds=DATA_RETENTION_DAYS * 86400),
+    ],
+}
+
+# sensor_data created before it became a time series: older readings keep top-level
+# lot_id/slot_id, newer ones use meta, and expiry still comes from a TTL index
+_REGULAR_SENSOR_INDEXES = [
+    *_INDEX_MODELS["sensor_data"],
+    IndexModel([("lot_id", ASCENDING), ("timestamp", DESCENDING)]),
+    IndexModel([("slot_id", ASCENDING), ("timestamp", DESCENDING)]),
+    IndexModel("timestamp", name="timestamp_ttl", expireAfterSeconds=DATA_RETENTION_DAYS * 86400),
+]
+
+# Stored lot location is {"lat", "lng"} plus top-level loc_lat/loc_lng numbers (read as arrays).
+# First step converts GeoJSON points; location is unset before it is rebuilt because $set with
+# an embedded document merges into the existing one instead of replacing it.
+_LOT_LOCATION_MIGRATIONS = (
+    (
+        {"location.coordinates": {"$exists": True}},
+        [
+            {"$set": {
+                "loc_lat": {"$arrayElemAt": ["$location.coordinates", 1]},
+                "loc_lng": {"$arrayElemAt": ["$location.coordinates", 0]},
+            }},
+            {"$unset": "location"},
+            {"$set": {"location": {"lat": "$loc_lat", "lng": "$loc_lng"}}},
+        ],
+    ),
+    (
+        {"loc_lat": {"$exists": False}, "location.lat": {"$exists": True}},
+        [{"$set": {"loc_lat": "$location.lat", "loc_lng": "$location.lng"}}],
+    ),
+)
+
+_OBSOLETE_INDEXES = (
+    ("sensor_data", "lot_id_1"),
+    ("sensor_data", "slot_id_1"),
+    ("reservations", "user_id_1"),
+    ("optimization_logs", "status_1"),
+    # plain timestamp indexes replaced by TTL ones on the same key (must go first)
+    ("sensor_data", "timestamp_1"),
+    ("optimization_logs", "timestamp_1"),
+    ("device_heartbeats", "timestamp_1"),
+)
+
+
+
+async def bulk_insert(collection, docs: list, batch: int = SENSOR_INSERT_BATCH):
+    """
+    insert_many in chunks that stay well under the 16 MB BSON message limit, with up to
+    BULK_INSERT_CONCURRENCY chunks in flight (returns diminish past a few concurrent writes).
+    """
+    semaphore = asyncio.Semaphore(BULK_INSERT_CONCURRENCY)
+
+    async def insert_chunk(chunk):
+        async with semaphore:
+            await collection.insert_many(chunk, ordered=False)
+
+    await asyncio.gather(*(insert_chunk(docs[i:i + batch]) for i in range(0, len(docs), batch)))
 
-            for lot in parking_lots:
-                await self.db.parking_lots.replace_one({"lot_id": lot["lot_id"]}, lot, upsert=True)
 
-            users = [
-                {
-                    "user_id": "user_001",
-                    "name": "John Doe",
-                    "email": "john@example.com",
-                    "phone": "+91-9876543210",
-                    "role": "user",
-                    "created_at": datetime.now(),
-                    "updated_at": datetime.now(),
-                },
+class DatabaseManager:
+    """
+    MongoDB database manager for Smart Parking System.
+
+    Uses PyMongo's native asyncio client, so operations go straight to the event loop with no
+    thread-pool hop (as Motor needs), and gather() fan-out scales with the connection pool.
+    MONGO_CLIENT_OPTIONS sizes that pool and sets wire compression (zstd, falling back to zlib),
+    w=1 and fail-fast server selection.
+    """
+
+    def __init__(self, mongodb_url="mongodb://localhost:27017", database_name="smart_parking"):
+        self.mongodb_url = mongodb_url
+        self.database_name = database_name
+        self.client = None
+        self.db = None
+
+    async def connect(self):
+        """Connect to MongoDB"""
+        try:
+            self.client = AsyncMongoClient(self.mongodb_url, **MONGO_CLIENT_OPTIONS)
+            self.db = self.client[self.database_name]
+
+            await self.client.admin.command("ping")
+            logger.info("Connected to MongoDB: %s", self.database_name)
+
+            sensor_timeseries = await self.ensure_sensor_timeseries()
+            await self.create_indexes(sensor_timeseries)
+            await self.migrate_lot_locations()
+
+        except Exception as e:
+            logger.error("Failed to connect to MongoDB: %s", e)
+            raise
+
+    async def disconnect(self):
+        """Disconnect from MongoDB"""
+        if self.client:
+            await self.client.close()
+            logger.info("Disconnected from MongoDB")
+
+    async def ensure_sensor_timeseries(self) -> bool:
+        """
+        Create sensor_data as a time series collection (bucketed storage, built-in expiry).
+        Returns whether sensor_data is a time series collection.
+        """
+        try:
+            await self.db.create_collection(
+                "sensor_data",
+                timeseries={"timeField": "timestamp", "metaField": "meta", "granularity": "seconds"},
+                expireAfterSeconds=DATA_RETENTION_DAYS * 86400,
+            )
+            logger.info("Created sensor_data time series collection")
+            return True
+        except CollectionInvalid:
+            # already exists; deployments predating this keep their regular collection
+            names = await self.db.list_collection_names(filter={"name": "sensor_data", "type": "timeseries"})
+            return bool(names)
+        except OperationFailure as e:
+            logger.warning("Time series collections unsupported (MongoDB < 5.0?): %s", e)
+            return False
+
+    async def create_indexes(self, sensor_timeseries: bool = True):
+        """Create necessary indexes for collections (sensor_data's depend on its collection type)"""
+        try:
+            # Indexes superseded by the ones below (absent on fresh DBs). Dropped first because
+            # a TTL index cannot be created over a plain index with the same key.
+            await asyncio.gather(
+                *(
+                    self.db[collection_name].drop_index(index_name)
+                    for collection_name, index_name in _OBSOLETE_INDEXES
+                ),
+                return_exceptions=True,
+            )
+            # createIndexes is a no-op for indexes that already exist with the same spec, so this
+            # is safe on every boot; one command per collection, all collections concurrently
+            index_models = dict(_INDEX_MODELS)
+            if not sensor_timeseries:
+                index_models["sensor_data"] = _REGULAR_SENSOR_INDEXES
+            await asyncio.gather(
+                *(
+                    self.db[collection_name].create_indexes(models)
+                    for collection_name, models in index_models.items()
+                )
+            )
+
+            logger.info("MongoDB indexes created successfully")
+
+        except Exception as e:
+            logger.error("Index creation failed: %s", e)
+
+    async def migrate_lot_locations(self):
+        """Rewrite lot locations into the stored form readers expect (no-op once migrated)"""
+        try:
+            for query, pipeline in _LOT_LOCATION_MIGRATIONS:
+                result = await self.db.parking_lots.update_many(query, pipeline)
+                if result.modified_count:
+                    logger.info("Normalized location on %d parking lots", result.modified_count)
+        except Exception as e:
+            logger.error("Lot location migration failed: %s", e)
+
+    async def initialize_sample_data(self):
+        """Initialize the DB with default Bengaluru sample data"""
+        try:
+            # Sensor readings are regenerated wholesale; lots and users are only inserted if missing
+            await self.db.sensor_data.delete_many({})
+
+            now = datetime.now(timezone.utc)  # one timezone-aware stamp for the whole seed
+            parking_lots = [
                 {
-                    "user_id": "admin_001",
-                    "name": "Admin User",
-                    "email": "admin@parking.in",
-                    "phone": "+91-9123456780",
-                    "role": "admin",
-                    "permissions": ["read", "write", "admin"],
-                    "created_at": datetime.now(),
-                    "updated_at": datetime.now(),
-                },
+                    **tpl,
+                    "loc_lat": tpl["location"]["lat"],
+                    "loc_lng": tpl["location"]["lng"],
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                for tpl in _LOT_TEMPLATES
             ]
-
-            for user in users:
-                await self.db.users.replace_one({"user_id": user["user_id"]}, user, upsert=True)
+            users = [{**tpl, "created_at": now, "updated_at": now} for tpl in _USER_TEMPLATES]
+
+            # One bulk_write per collection; $setOnInsert only writes documents that are missing,
+            # so reseeding leaves existing lots and users (and their live counters) untouched
+            await self.db.parking_lots.bulk_write(
+                [UpdateOne({"lot_id": lot["lot_id"]}, {"$setOnInsert": lot}, upsert=True) for lot in parking_lots],
+                ordered=False,
+            )
+            await self.db.users.bulk_write(
+                [UpdateOne({"user_id": user["user_id"]}, {"$setOnInsert": user}, upsert=True) for user in users],
+                ordered=False,
+            )
 
             # Example sensor data
-            sensor_data = []
-            for lot in parking_lots:
-                total = lot["total_slots"]
-                for slot_num in range(1, total + 1):
-                    sensor_data.append({
-                        "slot_id": f"{lot['lot_id']}_slot_{slot_num}",
-                        "lot_id": lot["lot_id"],
-                        "distance": 40.0 + (slot_num * 1.0),
-                        "timestamp": datetime.now(),
-                        "status": "free" if slot_num % 4 != 0 else "occupied",
-                        "device_id": f"device_{lot['lot_id']}",
-                    })
-            if sensor_data:
-                await self.db.sensor_data.insert_many(sensor_data)
-
-            logger.info("✅ Sample data initialized successfully")
+            sensor_data = [
+                {
+                    "meta": {"lot_id": lot_id, "slot_id": f"{lot_id}_slot_{slot_num}", "device_id": device_id},
+                    "distance": 40.0 + (slot_num * 1.0),
+                    "timestamp": now,
+                    "status": "free" if slot_num % 4 != 0 else "occupied",
+                }
+                for lot_id, total_slots, device_id in _SENSOR_LOTS
+                for slot_num in range(1, total_slots + 1)
+            ]
+            await bulk_insert(self.db.sensor_data, sensor_data)
+
+            logger.info("Sample data initialized successfully")
 
         except Exception as e:
-            logger.error(f"❌ Failed to initialize sample data: {e}")
+            logger.error("Failed to initialize sample data: %s", e)
 
     async def get_collection_stats(self):
-        """Get basic counts for each collection"""
-        stats = {}
-        for col in ["parking_lots", "reservations", "sensor_data", "users"]:
-            try:
-                stats[col] = await self.db[col].count_documents({})
-            except Exception as e:
-                stats[col] = f"Error: {e}"
-        return stats
+        """Get basic counts for each collection (metadata estimates, no collection scan)"""
+        collections = ["parking_lots", "reservations", "sensor_data", "users"]
+        counts = await asyncio.gather(
+            *(self.db[col].estimated_document_count() for col in collections),
+            return_exceptions=True,
+        )
+        return {
+            col: f"Error: {count}" if isinstance(count, Exception) else count
+            for col, count in zip(collections, counts)
+        }
 
 
 # Shared global instance
 database_manager = DatabaseManager()
 db = None
+_connect_lock = asyncio.Lock()
 
 
-async def connect_to_mongo():
-    """Establish MongoDB connection and initialize sample data."""
+async def get_db():
+    """Shared database handle; the module-level manager connects once, on first use."""
     global db
-    await database_manager.connect()
-    db = database_manager.db
-    await database_manager.initialize_sample_data()
+    if db is None:
+        async with _connect_lock:
+            if db is None:
+                await database_manager.connect()
+                db = database_manager.db
+    return db
+
+
+async def connect_to_mongo(seed: Optional[bool] = None):
+    """Establish MongoDB connection; seed sample data only when asked (seed=True or SEED_DB=1)."""
+    if seed is None:
+        # Imported here so `python core/database.py` runs without the backend root on sys.path
+        from core.config import SEED_DB
+        seed = SEED_DB
+    await get_db()
+    if seed:
+        await database_manager.initialize_sample_data()
 
 
 async def close_mongo():
     """Close MongoDB connection cleanly."""
+    global db
     await database_manager.disconnect()
+    db = None
 
 
 # Allow running this file directly for database seeding
 if __name__ == "__main__":
-    import asyncio
     async def main():
-        await connect_to_mongo()
+        await connect_to_mongo(seed=True)
         stats = await database_manager.get_collection_stats()
         print("📊 Database Stats:", stats)
         await close_mongo()
@@ -1,35 +1,118 @@
 # backend/crpark_manager.py
-import random, time
+import threading
+
+import numpy as np
+
+# Parameters for lots the manager does not track; they have no R-slots to hand out
+_DEFAULT_PARAMS = {"Pa": 0.7, "Rs": 0.5, "Tdl": 300}
+
+_RNG_BATCH = 8192  # uniform draws generated per refill
 
 class CRParkManager:
     def __init__(self):
-        # Simulate per-parking-lot management data
-        self.lots = {
-            1: {"Pa": 0.75, "Rs": 0.6, "Tdl": 300, "available_r": 10, "available_c": 40},
-            2: {"Pa": 0.65, "Rs": 0.5, "Tdl": 240, "available_r": 12, "available_c": 35}
+        # Simulate per-parking-lot management data as parallel arrays (struct-of-arrays);
+        # _idx maps a lot id to its position in every array
+        self._idx = {1: 0, 2: 1}
+        self._Pa = np.array([0.75, 0.65])
+        self._Rs = np.array([0.6, 0.5])
+        self._Tdl = np.array([300, 240], dtype=np.int32)
+        self._avail_r = np.array([10, 12], dtype=np.int32)
+        self._avail_c = np.array([40, 35], dtype=np.int32)
+        # process_reservation runs in worker threads; guards the available_r check-and-decrement
+        # and the draw buffer position
+        self._lock = threading.Lock()
+        self._rng = np.random.default_rng()
+        self._draws = []
+        self._rng_i = 0
+
+    def _uniform(self):
+        """Next U[0, 1) draw, taken from a batch generated _RNG_BATCH at a time."""
+        with self._lock:
+            if self._rng_i >= len(self._draws):
+                self._draws = self._rng.random(_RNG_BATCH, dtype=np.float32).tolist()
+                self._rng_i = 0
+            value = self._draws[self._rng_i]
+            self._rng_i += 1
+        return value
+
+    def _row(self, i):
+        return {
+            "Pa": float(self._Pa[i]),
+            "Rs": float(self._Rs[i]),
+            "Tdl": int(self._Tdl[i]),
+            "available_r": int(self._avail_r[i]),
+            "available_c": int(self._avail_c[i]),
         }
 
+    @property
+    def lots(self):
+        """Lot parameters as {lot_id: {...}}; a copy, updates go through process_reservation."""
+        return {lot_id: self._row(i) for lot_id, i in self._idx.items()}
+
     def get_params(self, lot_id):
-        return self.lots.get(lot_id, {"Pa": 0.7, "Rs": 0.5, "Tdl": 300})
+        i = self._idx.get(lot_id, -1)
+        return dict(_DEFAULT_PARAMS) if i == -1 else self._row(i)
 
     def process_reservation(self, lot_id, first_request=True):
-        params = self.get_params(lot_id)
+        i = self._idx.get(lot_id, -1)
+        if i == -1:
+            pa, tdl = _DEFAULT_PARAMS["Pa"], _DEFAULT_PARAMS["Tdl"]
+        else:
+            pa, tdl = float(self._Pa[i]), int(self._Tdl[i])
         accepted, slot_type = False, "C"
 
         if first_request:
-            if random.random() <= params["Pa"]:
+            if self._uniform() <= pa:
                 accepted, slot_type = True, "R"
-        else:
+        elif i != -1:
             # Second request accepted if R-slot still available
-            if params["available_r"] > 0:
-                params["available_r"] -= 1
-                accepted, slot_type = True, "R"
-            else:
-                slot_type = "C"
+            with self._lock:
+                if self._avail_r[i] > 0:
+                    self._avail_r[i] -= 1
+                    accepted, slot_type = True, "R"
 
         return {
             "accepted": accepted,
             "slot_type": slot_type,
-            "Pa": params["Pa"],
-            "Tdl": params["Tdl"],
+            "Pa": pa,
+            "Tdl": tdl,
+        }
+
+    def process_reservation_batch(self, lot_ids, first_request=True):
+        """process_reservation over many requests at once; returns arrays aligned with lot_ids."""
+        n = len(lot_ids)
+        idx = np.fromiter((self._idx.get(lot_id, -1) for lot_id in lot_ids), dtype=np.int64, count=n)
+        first = np.broadcast_to(np.asarray(first_request, dtype=bool), (n,))
+        # Index -1 picks the appended defaults for lots the manager does not track
+        pa = np.append(self._Pa, _DEFAULT_PARAMS["Pa"])[idx]
+        tdl = np.append(self._Tdl, _DEFAULT_PARAMS["Tdl"])[idx]
+        second = ~first & (idx >= 0)
+        lots = idx[second]
+
+        with self._lock:
+            u = self._rng.random(n, dtype=np.float32)
+            # The k-th second request for a lot (in request order) gets an R-slot while k < available_r
+            order = np.argsort(lots, kind="stable")
+            sorted_lots = lots[order]
+            starts = np.empty(lots.size, dtype=bool)
+            starts[:1] = True
+            starts[1:] = sorted_lots[1:] != sorted_lots[:-1]
+            positions = np.arange(lots.size)
+            rank = np.empty_like(positions)
+            rank[order] = positions - np.maximum.accumulate(np.where(starts, positions, 0))
+            second_accept = rank < self._avail_r[lots]
+            self._avail_r -= np.bincount(lots[second_accept], minlength=self._avail_r.size).astype(np.int32)
+
+        accepted = first & (u <= pa)
+        accepted[second] = second_accept
+        return {
+            "accepted": accepted,
+            "slot_type": np.where(accepted, "R", "C"),
+            "Pa": pa,
+            "Tdl": tdl,
         }
+
+    def snapshot(self):
+        """Consistent copy of the lot parameters for readers."""
+        with self._lock:
+            return self.lots
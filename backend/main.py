@@ -2,11 +2,15 @@
 
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 import logging
 import asyncio
+import os
+from contextlib import asynccontextmanager
 
 # Project imports
 from core.database import connect_to_mongo, close_mongo
+from core.config import ENVIRONMENT
 from routes.base_routes import router as base_router
 from routes.parking_routes import router as parking_router
 from routes.reservation_routes import router as reservation_router
@@ -14,17 +18,72 @@ from routes.sensor_routes import router as sensor_router
 from routes.analytics_routes import router as analytics_router
 from routes.optimization_routes import router as optimization_router
 from auth.router import router as auth_router
+from auth.cache import shared_token_cache
 from ws.manager import manager
-
-from services.gmm_service import train_gmm
+from services.sensor_service import flush_sensor_buffer, run_sensor_flusher
+from services.http_client import close_http_client
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("smart_parking_main")
 
+def _warm_gmm():
+    """Import sklearn and load (or train once) the GMM (runs off the event loop)."""
+    try:
+        from services.gmm_service import load_or_train_gmm
+        load_or_train_gmm()
+    except Exception as e:
+        logger.warning("GMM training/loading failed at startup: %s", e)
+
+def _warm_kernels():
+    """JIT-compile the numba cost kernels (a no-op check without numba)."""
+    try:
+        from services.cost_service import warm_kernels
+        warm_kernels()
+    except Exception as e:
+        logger.warning("Kernel warm-up failed at startup: %s", e)
+
+def _log_routes(app: FastAPI):
+    """Print registered routes for debugging (helps confirm optimization route exists)"""
+    routes_info = [
+        f"{','.join(sorted(getattr(r, 'methods', None) or ())):10s} {r.path}"
+        for r in app.routes
+    ]
+    logger.info("Registered routes:\n%s", "\n".join(routes_info))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info("🚀 Starting Smart Parking Backend...")
+    # GMM load (or first-run fit) starts on a worker thread so it overlaps the Mongo handshake; the server
+    # accepts requests without waiting for it and /ready reports when it is done
+    loop = asyncio.get_running_loop()
+    app.state.gmm_task = loop.run_in_executor(None, _warm_gmm)
+    loop.run_in_executor(None, _warm_kernels)
+    await connect_to_mongo()
+    sensor_flusher = asyncio.create_task(run_sensor_flusher())
+    if os.getenv("SMART_PARKING_DEBUG_ROUTES") == "1":  # dev aid; skipped on every worker in prod
+        _log_routes(app)
+    logger.info("✅ Backend initialized successfully!")
+
+    yield
+
+    logger.info("🛑 Shutting down Smart Parking Backend...")
+    sensor_flusher.cancel()
+    await asyncio.gather(sensor_flusher, return_exceptions=True)
+    await flush_sensor_buffer()  # readings received since the last tick
+    await manager.close_all()
+    await close_mongo()
+    logger.info("✅ MongoDB connection closed.")
+    await shared_token_cache.close()
+    await close_http_client()
+
 app = FastAPI(
     title="Smart Parking System API",
     description="CRPark-inspired Smart Parking with modular backend structure (MongoDB + FastAPI)",
     version="3.0.0",
+    lifespan=lifespan,
+    # jsonable_encoder still runs before ORJSONResponse.render and rejects numpy scalars,
+    # so routes convert with .tolist() / float() / int() before returning
+    default_response_class=ORJSONResponse,
 )
 
 app.add_middleware(
@@ -35,8 +94,10 @@ app.add_middleware(
         "http://localhost:5173",
     ],
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    # Explicit lists: the routers only expose GET/POST and the SPAs send these headers.
+    # Starlette precomputes the preflight response instead of echoing request headers back.
+    allow_methods=["GET", "POST", "OPTIONS"],
+    allow_headers=["Authorization", "Content-Type", "X-Requested-With"],
 )
 
 # include routers
@@ -52,46 +113,30 @@ app.include_router(optimization_router)
 async def websocket_endpoint(websocket: WebSocket):
     await manager.connect(websocket)
     try:
+        # Clients only listen; read raw ASGI messages (text or bytes, no decoding) until close.
+        # Half-open sockets are caught by uvicorn's protocol-level pings (ws_ping_interval).
         while True:
-            await websocket.receive_text()
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
     except WebSocketDisconnect:
+        pass
+    finally:
         manager.disconnect(websocket)
         logger.info("🔌 WebSocket client disconnected")
 
-@app.on_event("startup")
-async def startup_event():
-    logger.info("🚀 Starting Smart Parking Backend...")
-    await connect_to_mongo()
-    # Train/load GMM (if heavy, consider moving to background task)
-    try:
-        train_gmm()
-    except Exception as e:
-        logger.warning("GMM training/loading failed at startup: %s", e)
-
-    # Print registered routes for debugging (helps confirm optimization route exists)
-    try:
-        from fastapi.routing import APIRoute
-        routes_info = []
-        for r in app.routes:
-            # only print normal API routes (skip static/other internal routes)
-            try:
-                method = ",".join(sorted(r.methods)) if hasattr(r, "methods") else ""
-                path = r.path
-                routes_info.append(f"{method:10s} {path}")
-            except Exception:
-                continue
-        logger.info("Registered routes:\n" + "\n".join(routes_info))
-    except Exception as e:
-        logger.warning("Failed to enumerate routes: %s", e)
-
-    logger.info("✅ Backend initialized successfully!")
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    logger.info("🛑 Shutting down Smart Parking Backend...")
-    await close_mongo()
-    logger.info("✅ MongoDB connection closed.")
-
 if __name__ == "__main__":
+    import sys
     import uvicorn
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+    # uvloop + httptools ship with uvicorn[standard] (uvloop is not available on Windows).
+    # Reload and multiple workers are mutually exclusive, so only development reloads.
+    dev = ENVIRONMENT == "development"
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+        reload=dev,
+        workers=1 if dev else os.cpu_count(),
+    )
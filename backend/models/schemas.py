@@ -1,6 +1,8 @@
-from pydantic import BaseModel
-from typing import Dict, Optional
-from datetime import datetime
+from pydantic import BaseModel, Field, model_validator
+from typing import Dict, List, Optional
+from datetime import datetime, timedelta, timezone
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
 
 class ParkingRequest(BaseModel):
     user_id: str
@@ -24,5 +26,18 @@ class SensorData(BaseModel):
     slot_id: str
     lot_id: str
     distance: float
-    timestamp: datetime
+    timestamp: Optional[datetime] = None  # parsed by pydantic-core at validation, stored as a BSON date
+    ts_ns: Optional[int] = Field(default=None, exclude=True)  # epoch ns; the IoT simulators send this instead
     status: str
+
+    @model_validator(mode="after")
+    def _timestamp_from_ns(self):
+        if self.timestamp is None:
+            if self.ts_ns is None:
+                raise ValueError("timestamp or ts_ns is required")
+            self.timestamp = _EPOCH + timedelta(microseconds=self.ts_ns // 1000)
+        return self
+
+class SensorBatch(BaseModel):
+    device_id: Optional[str] = None
+    readings: List[SensorData]
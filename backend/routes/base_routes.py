@@ -1,6 +1,7 @@
 # backend/routes/base_routes.py
-from fastapi import APIRouter
-from datetime import datetime
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+from datetime import datetime, timezone
 
 router = APIRouter()
 
@@ -10,4 +11,12 @@ async def root():
 
 @router.get("/health", tags=["base"])
 async def health_check():
-    return {"status": "healthy", "timestamp": datetime.now()}
+    return {"status": "healthy", "timestamp": datetime.now(timezone.utc)}
+
+@router.get("/ready", tags=["base"])
+async def readiness_check(request: Request):
+    """503 until startup warm-up (GMM training) has finished."""
+    gmm_task = getattr(request.app.state, "gmm_task", None)
+    if gmm_task is None or not gmm_task.done():
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    return {"status": "ready"}
@@ -0,0 +1,37 @@
+# backend/routes/gzip_route.py
+import zlib
+
+from fastapi import HTTPException, Request
+from fastapi.routing import APIRoute
+
+from core.config import MAX_DECOMPRESSED_BODY
+
+
+class GzipRequest(Request):
+    """Request whose body is transparently inflated when sent with Content-Encoding: gzip."""
+
+    async def body(self) -> bytes:
+        if not hasattr(self, "_body"):
+            body = await super().body()
+            if "gzip" in self.headers.getlist("Content-Encoding"):
+                inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                try:
+                    body = inflater.decompress(body, MAX_DECOMPRESSED_BODY)
+                except zlib.error:
+                    raise HTTPException(status_code=400, detail="Invalid gzip body")
+                if inflater.unconsumed_tail:
+                    raise HTTPException(status_code=413, detail="Decompressed body too large")
+            self._body = body
+        return self._body
+
+
+class GzipRoute(APIRoute):
+    """Route class for routers that accept gzip-compressed request bodies."""
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def gzip_handler(request: Request):
+            return await handler(GzipRequest(request.scope, request.receive))
+
+        return gzip_handler
@@ -1,14 +1,16 @@
-import requests
+import numpy as np
 from fastapi import APIRouter
-import random
 import os
+from services.http_client import get_http_client
 
 router = APIRouter()
 
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
+_rng = np.random.default_rng()
+
 @router.get("/parking-lots/live")
-def get_live_parking(lat: float, lng: float):
+async def get_live_parking(lat: float, lng: float):
 
     # Call Google Nearby Places API
     url = (
@@ -16,33 +18,34 @@ def get_live_parking(lat: float, lng: float):
         f"?location={lat},{lng}&radius=2000&type=parking&key={GOOGLE_API_KEY}"
     )
 
-    response = requests.get(url).json()
+    response = (await get_http_client().get(url)).json()
     results = response.get("results", [])
 
-    parking_lots = []
-
-    for r in results:
-        lot_id = r["place_id"]
-
-        # Simulated dynamic slot values (like Ola, Uber)
-        total_slots = random.randint(40, 200)
-        occupied = random.randint(0, total_slots)
-        reserved = random.randint(0, total_slots - occupied)
-        competitive = total_slots - occupied - reserved
+    # Simulated dynamic slot values (like Ola, Uber), drawn for every result at once
+    n = len(results)
+    total_slots = _rng.integers(40, 201, size=n)
+    occupied = _rng.integers(0, total_slots + 1)
+    reserved = _rng.integers(0, total_slots - occupied + 1)
+    competitive = total_slots - occupied - reserved
 
-        parking_lots.append({
-            "lot_id": lot_id,
+    parking_lots = [
+        {
+            "lot_id": r["place_id"],
             "name": r["name"],
             "location": {
                 "lat": r["geometry"]["location"]["lat"],
                 "lng": r["geometry"]["location"]["lng"]
             },
             "address": r.get("vicinity", "Unknown"),
-            "total_slots": total_slots,
-            "occupied_slots": occupied,
-            "reserved_slots": reserved,
-            "competitive_slots": competitive,
+            "total_slots": total,
+            "occupied_slots": occ,
+            "reserved_slots": res,
+            "competitive_slots": comp,
             "live": True
-        })
+        }
+        for r, total, occ, res, comp in zip(
+            results, total_slots.tolist(), occupied.tolist(), reserved.tolist(), competitive.tolist()
+        )
+    ]
 
     return {"lots": parking_lots}
@@ -1,13 +1,13 @@
 from fastapi import APIRouter, HTTPException, Body, Depends
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from datetime import datetime
-import numpy as np
+from datetime import datetime, timezone
 import logging
 from typing import Dict, Any, Optional
 
 from core import database
-from services import cost_service
+from services import cost_service, optimization_service
+from services.lot_cache import lot_cache
 from services.crpark_service import CRParkManagerSimple
 
 router = APIRouter()
@@ -29,6 +29,9 @@ class OptimizationResult(BaseModel):
     num_lots_optimized: int = 0
     parameters: Dict[str, Any] = {}
 
+# The placeholder SA-VNS only needs lot ids
+_SA_PROJECTION = {"_id": 1, "lot_id": 1}
+
 async def get_db():
     return database.db
 
@@ -36,31 +39,24 @@ async def simulated_annealing_vns(db) -> Dict[str, Any]:
     """Optimization algorithm that adjusts pa_i and rs_i dynamically."""
     try:
         # Get all parking lots from the database
-        lots_cursor = db.parking_lots.find({})
+        lots_cursor = db.parking_lots.find({}, _SA_PROJECTION)
         lots = await lots_cursor.to_list(length=100)  # Limit to 100 lots for safety
         
         if not lots:
             logger.warning("No parking lots found for optimization")
             # Return default parameters for some common lot IDs
-            return {
-                lot_id: {
-                    "pa_i": round(np.clip(np.random.uniform(0.6, 0.9), 0, 1), 2),
-                    "rs_i": round(np.clip(np.random.uniform(0.1, 0.3), 0, 1), 2),
-                    "updated_at": datetime.utcnow()
-                }
-                for lot_id in ["lot_001", "lot_002", "lot_003"]
-            }
+            params = optimization_service.random_parameters(["lot_001", "lot_002", "lot_003"])
+            now = datetime.now(timezone.utc)
+            for lot_params in params.values():
+                lot_params["updated_at"] = now
+            return params
             
-        return_params = {}
-        for lot in lots:
-            lot_id = lot.get('lot_id') or f"lot_{str(lot.get('_id', 'unknown'))}"
-            # Generate random values within reasonable ranges
-            return_params[lot_id] = {
-                "pa_i": round(np.clip(np.random.uniform(0.6, 0.9), 0, 1), 2),
-                "rs_i": round(np.clip(np.random.uniform(0.1, 0.3), 0, 1), 2),
-                "updated_at": datetime.utcnow()
-            }
-        return return_params
+        # Placeholder values: returned and logged, never written to parking_lots
+        params = optimization_service.simulated_annealing_vns(lots)
+        now = datetime.now(timezone.utc)
+        for lot_params in params.values():
+            lot_params["updated_at"] = now
+        return params
     except Exception as e:
         logger.error(f"Error in simulated_annealing_vns: {str(e)}")
         raise
@@ -93,7 +89,7 @@ async def optimize(
         
         # Create optimization result
         optimization_result = {
-            "timestamp": datetime.utcnow(),
+            "timestamp": datetime.now(timezone.utc),
             "parameters": best_params,
             "status": "completed",
             "num_lots_optimized": len(best_params)
@@ -169,32 +165,11 @@ async def get_latest_optimization(db = Depends(get_db)):
 @router.post("/optimize/cost", tags=["optimization"])
 async def optimize_cost(req: OptimizeRequest, db = Depends(get_db)):
     """Find the optimal parking lot based on cost and distance."""
-    if not db:
+    if db is None:
         raise HTTPException(status_code=500, detail="Database not connected")
 
-    lots_cursor = db.parking_lots.find({})
-    lots = []
-    async for lot in lots_cursor:
-        lot["_id"] = str(lot["_id"])
-
-        # Normalize location
-        loc = lot.get("location", {})
-        if isinstance(loc, dict):
-            if "coordinates" in loc and isinstance(loc["coordinates"], list):
-                lat = loc["coordinates"][1]
-                lng = loc["coordinates"][0]
-            else:
-                lat = loc.get("lat")
-                lng = loc.get("lng")
-        else:
-            lat = lng = None
-
-        lot["location"] = {
-            "lat": lat if lat is not None else 12.9716,
-            "lng": lng if lng is not None else 77.5946,
-        }
-
-        lots.append(lot)
+    snapshot = await lot_cache.get(db)
+    lots = snapshot.cost_lots
 
     if not lots:
         return {
@@ -202,12 +177,11 @@ async def optimize_cost(req: OptimizeRequest, db = Depends(get_db)):
             "message": "No parking lots found"
         }
 
-    costs = {}
-    for lot in lots:
-        try:
-            costs[lot["lot_id"]] = cost_service.calculate_parking_cost(req, lot)
-        except Exception as e:
-            logger.warning(f"Cost calculation failed for {lot.get('lot_id')}: {e}")
+    try:
+        optimal_lot, costs = await cost_service.optimal_parking_costs(req, lots, table=snapshot.cost_table)
+    except Exception as e:
+        logger.warning("Cost calculation failed: %s", e)
+        costs = {}
 
     if not costs:
         return {
@@ -215,8 +189,6 @@ async def optimize_cost(req: OptimizeRequest, db = Depends(get_db)):
             "message": "Cost calculation failed for all lots"
         }
 
-    optimal_lot = min(costs.keys(), key=lambda x: costs[x]["total_cost"])
-
     return {
         "success": True,
         "optimal_lot": optimal_lot,
@@ -1,10 +1,10 @@
 # backend/routes/parking_routes.py
 
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import Dict
 from core import database
+from models.schemas import ParkingRequest
 from services import cost_service
+from services.lot_cache import lot_cache
 import logging
 
 logger = logging.getLogger("smart_parking")
@@ -12,14 +12,6 @@ logger = logging.getLogger("smart_parking")
 router = APIRouter()
 
 
-class ParkingRequest(BaseModel):
-    user_id: str
-    current_location: Dict[str, float]
-    destination: Dict[str, float]
-    arrival_time: str = None
-    duration: int = 60
-
-
 # ============================================================
 # GET PARKING LOTS
 # ============================================================
@@ -29,30 +21,7 @@ async def get_parking_lots():
     if db is None:
         raise HTTPException(status_code=500, detail="Database not connected")
 
-    lots_cursor = db.parking_lots.find({})
-    lots = []
-
-    async for lot in lots_cursor:
-        lot["_id"] = str(lot["_id"])
-
-        # Normalize location
-        loc = lot.get("location", {})
-        if isinstance(loc, dict):
-            if "coordinates" in loc and isinstance(loc["coordinates"], list):
-                lng, lat = loc["coordinates"][0], loc["coordinates"][1]
-            else:
-                lat = loc.get("lat")
-                lng = loc.get("lng")
-        else:
-            lat = lng = None
-
-        # Safe defaults
-        lot["location"] = {
-            "lat": lat if lat is not None else 12.9716,
-            "lng": lng if lng is not None else 77.5946,
-        }
-
-        lots.append(lot)
+    lots = (await lot_cache.get(db)).lots
 
     return {"count": len(lots), "currency": "INR", "lots": lots}
 
@@ -66,56 +35,23 @@ async def predict_parking_cost(req: ParkingRequest):
     if db is None:
         raise HTTPException(status_code=500, detail="Database not connected")
 
-    lots_cursor = db.parking_lots.find({})
-    lots_data = []
-
-    async for lot in lots_cursor:
-        lot["_id"] = str(lot["_id"])
-
-        # Normalize location
-        loc = lot.get("location", {})
-        if isinstance(loc, dict):
-            if "coordinates" in loc and isinstance(loc["coordinates"], list):
-                lat = loc["coordinates"][1]
-                lng = loc["coordinates"][0]
-            else:
-                lat = loc.get("lat")
-                lng = loc.get("lng")
-        else:
-            lat = lng = None
-
-        # Safe defaults for cost calc
-        lot["location"] = {
-            "lat": lat if lat is not None else 12.9716,
-            "lng": lng if lng is not None else 77.5946,
-        }
-
-        lot["occupied_slots"] = lot.get("occupied_slots", 1)
-        lot["reserved_slots"] = lot.get("reserved_slots", 0)
-        lot["total_slots"] = lot.get("total_slots", 10)
-        lot["hourly_rate"] = lot.get("hourly_rate", 40.0)
-        lot["pa_i"] = lot.get("pa_i", 0.7)
-
-        lots_data.append(lot)
+    snapshot = await lot_cache.get(db)
+    lots_data = snapshot.cost_lots
 
     if not lots_data:
         raise HTTPException(status_code=400, detail="No parking lots available")
 
-    costs = {}
-    for lot in lots_data:
-        try:
-            # KEY FIX: pass req (model), not req.dict()
-            costs[lot["lot_id"]] = cost_service.calculate_parking_cost(req, lot)
-        except Exception as e:
-            logger.exception("Cost calc failed for lot %s: %s", lot.get("lot_id"), e)
+    # One vectorized pass over every lot (pass req (model), not req.model_dump())
+    try:
+        optimal_lot, costs = await cost_service.optimal_parking_costs(req, lots_data, table=snapshot.cost_table)
+    except Exception as e:
+        logger.exception("Cost calc failed: %s", e)
+        costs = {}
 
     if not costs:
         raise HTTPException(status_code=400, detail="No valid parking lots found")
 
-    optimal_lot = min(costs.keys(), key=lambda x: costs[x]["total_cost"])
-    lot_name = next(
-        (l["name"] for l in lots_data if l["lot_id"] == optimal_lot), "Unknown"
-    )
+    lot_name = snapshot.by_id.get(optimal_lot, {}).get("name", "Unknown")
 
     return {
         "optimal_lot": optimal_lot,
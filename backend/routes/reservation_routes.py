@@ -1,111 +1,100 @@
 # backend/routes/reservation_routes.py
 
-from fastapi import APIRouter, HTTPException, Body
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Body, Response
 from services import crpark_service
 from core import database
-from ws.manager import manager as ws_manager
-from datetime import datetime
-import json
+from ws.manager import manager as ws_manager, dumps as ws_dumps
+from datetime import datetime, timedelta, timezone
 import logging
-import inspect
 import asyncio
+import io
+import itertools
+import time
+from dataclasses import dataclass
+from functools import lru_cache
 from services import cost_service  # used for fallback lot selection
+from services.lot_cache import lot_cache
+
+try:
+    import qrcode
+    import qrcode.image.svg
+except ImportError:  # optional: only GET /reservations/{id}/qr needs it
+    qrcode = None
 
 logger = logging.getLogger("smart_parking")
 router = APIRouter()
 
 crpark_manager = crpark_service.CRParkManagerSimple()
 
+# Fallback origin/destination when a reservation body carries neither (central Bengaluru)
+_DEFAULT_POINT = {"lat": 12.9716, "lng": 77.5946}
+
+
+@dataclass(slots=True)
+class _CostQuery:
+    """The two ParkingRequest fields cost_service reads, for bodies that are not a ParkingRequest."""
+    current_location: dict
+    destination: dict
+
+# Millisecond timestamps collide under concurrent requests; the counter keeps IDs
+# unique within a process and time_ns() keeps them ordered across restarts
+_reservation_counter = itertools.count()
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
 
-class ReservationRequest(BaseModel):
-    lot_id: str
-    first_request: bool = True
-    user_id: str | None = None
+def _make_reservation_id() -> tuple[str, datetime]:
+    """(reservation_id, creation time) from a single clock read."""
+    ts_ns = time.time_ns()
+    return f"resv-{ts_ns}-{next(_reservation_counter)}", _EPOCH + timedelta(microseconds=ts_ns // 1000)
 
 
-def _extract_field(data: dict, *variants, default=None):
-    if not isinstance(data, dict):
-        return default
+def _extract_field(data: dict, lowered: dict, *variants, default=None):
+    """First variant present in data, else matched case-insensitively via lowered (see _lower_keys)."""
     for v in variants:
         if v in data:
             return data[v]
-    for k, val in data.items():
-        for v in variants:
-            if k.lower() == v.lower():
-                return val
+    for v in variants:
+        key = v.lower()
+        if key in lowered:
+            return lowered[key]
     return default
 
 
+def _lower_keys(data: dict) -> dict:
+    """Lowercased-key view of a request body, built once and shared by every _extract_field call."""
+    return {k.lower(): v for k, v in data.items()}
+
+
 async def _select_fallback_lot(req_body: dict):
     db = database.db
-    if not db:
+    if db is None:
         return None
 
-    lots_cursor = db.parking_lots.find({})
-    lots = []
-    async for lot in lots_cursor:
-        lot["_id"] = str(lot["_id"])
-
-        loc = lot.get("location", {})
-        if isinstance(loc, dict):
-            if "coordinates" in loc and isinstance(loc["coordinates"], list):
-                lat = loc["coordinates"][1]
-                lng = loc["coordinates"][0]
-            else:
-                lat = loc.get("lat")
-                lng = loc.get("lng")
-        else:
-            lat = lng = None
-
-        lot["location"] = {
-            "lat": lat if lat is not None else 12.9716,
-            "lng": lng if lng is not None else 77.5946
-        }
-        lot["occupied_slots"] = lot.get("occupied_slots", 1)
-        lot["reserved_slots"] = lot.get("reserved_slots", 0)
-        lot["total_slots"] = lot.get("total_slots", 10)
-        lot["hourly_rate"] = lot.get("hourly_rate", 40.0)
-        lot["pa_i"] = lot.get("pa_i", 0.7)
-
-        lots.append(lot)
-
-    costs = {}
-    for lot in lots:
-        try:
-            class _TmpReq:
-                def __init__(self, body):
-                    self.current_location = (
-                        body.get("current_location")
-                        or body.get("currentLocation")
-                        or {"lat": 12.9716, "lng": 77.5946}
-                    )
-                    self.destination = (
-                        body.get("destination")
-                        or body.get("dest")
-                        or {"lat": 12.9716, "lng": 77.5946}
-                    )
-
-            tmp = _TmpReq(req_body or {})
-            costs[lot["lot_id"]] = cost_service.calculate_parking_cost(tmp, lot)
-
-        except Exception as e:
-            logger.debug("Fallback cost calc failed for %s: %s", lot.get("lot_id"), e)
-            continue
-
-    if not costs:
+    snapshot = await lot_cache.get(db)
+    lots = snapshot.cost_lots
+    if not lots:
         return None
 
-    optimal = min(costs.keys(), key=lambda x: costs[x]["total_cost"])
-    return optimal
+    body = req_body or {}
+    request = _CostQuery(
+        current_location=body.get("current_location") or body.get("currentLocation") or _DEFAULT_POINT,
+        destination=body.get("destination") or body.get("dest") or _DEFAULT_POINT,
+    )
+    # Only the argmin is needed: haversine times, no per-lot breakdowns
+    try:
+        return await cost_service.cheapest_lot(request, lots, table=snapshot.cost_table)
+    except Exception as e:
+        logger.debug("Fallback cost calc failed: %s", e)
+        return None
 
 
 @router.post("/reserve", tags=["reservation"])
 @router.post("/api/reserve", tags=["reservation"])
 async def reserve_spot(body: dict = Body(...)):
-    lot_id = _extract_field(body, "lot_id", "lotId", "lot")
-    first_request = _extract_field(body, "first_request", "firstRequest", default=True)
-    user_id = _extract_field(body, "user_id", "userId", "user")
+    lowered = _lower_keys(body)
+    lot_id = _extract_field(body, lowered, "lot_id", "lotId", "lot")
+    first_request = _extract_field(body, lowered, "first_request", "firstRequest", default=True)
+    user_id = _extract_field(body, lowered, "user_id", "userId", "user")
 
     if isinstance(first_request, str):
         fr = first_request.lower()
@@ -121,12 +110,14 @@ async def reserve_spot(body: dict = Body(...)):
     # FIXED: CRPark Logic (Correct Position)
     # ============================
     try:
+        # A precomputed lookup now; no worker thread needed
         result = crpark_manager.process_reservation(lot_id, first_request)
     except Exception as e:
         logger.exception(f"CRPark Reservation Logic Failed: {e}")
         raise HTTPException(status_code=500, detail=f"CRPark reservation failure: {e}")
 
-    reservation_id = f"resv-{int(datetime.utcnow().timestamp() * 1000)}"
+    # One clock read for the ID, the broadcast and the stored document
+    reservation_id, now = _make_reservation_id()
 
     payload = {
         "type": "reservation_update",
@@ -136,41 +127,39 @@ async def reserve_spot(body: dict = Body(...)):
         "Pa": result.get("Pa"),
         "slot_type": result.get("slot_type"),
         "Tdl": result.get("Tdl"),
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": now
     }
 
-    # ============================
-    # Safe WebSocket Broadcast
-    # ============================
-    try:
-        await ws_manager.broadcast(json.dumps(payload))
-    except Exception as e:
-        logger.warning("Websocket broadcast failed: %s", e)
-
     # ============================
     # Safe DB Write
     # ============================
+    # Awaited, not backgrounded: clients read the reservation back by the returned ID
+    # (/reservations/{id}/qr, /reservations/{user_id}) as soon as this responds
     try:
         db = database.db
-        if db and hasattr(db, "reservations") and hasattr(db.reservations, "insert_one"):
-            insert_fn = db.reservations.insert_one
-
-            data_to_insert = {
+        if db is not None:  # always the async PyMongo database once connected
+            await db.reservations.insert_one({
                 "reservation_id": reservation_id,
                 "lot_id": lot_id,
                 "user_id": user_id,
                 "result": result,
-                "created_at": datetime.utcnow()
-            }
-
-            if inspect.iscoroutinefunction(insert_fn):
-                await insert_fn(data_to_insert)
-            else:
-                insert_fn(data_to_insert)
+                "start_time": now,  # sort key of the (user_id, start_time) index
+                "created_at": now
+            })
 
     except Exception as db_err:
         logger.warning("DB write failed: %s", db_err)
 
+    # ============================
+    # Safe WebSocket Broadcast
+    # ============================
+    # Only enqueues per client (ws.manager sender tasks do the socket writes), so it adds no
+    # latency here; sent after the write so subscribers can already fetch the reservation
+    try:
+        await ws_manager.broadcast(ws_dumps(payload))
+    except Exception as e:
+        logger.warning("Websocket broadcast failed: %s", e)
+
     return {
         "success": True,
         "message": "Reservation processed",
@@ -184,6 +173,45 @@ async def reserve_spot(body: dict = Body(...)):
 
 
 
+USER_RESERVATIONS_LIMIT = 100
+
+
+@router.get("/reservations/{user_id}", tags=["reservation"])
+async def get_user_reservations(user_id: str):
+    """Most recent reservations for a user, newest first (served by the user_id/start_time index)."""
+    db = database.db
+    if db is None:
+        raise HTTPException(status_code=500, detail="Database not connected")
+    cursor = (
+        db.reservations.find({"user_id": user_id}, {"_id": 0, "qr_code": 0})
+        .sort("start_time", -1)
+        .limit(USER_RESERVATIONS_LIMIT)
+    )
+    return await cursor.to_list(length=USER_RESERVATIONS_LIMIT)
+
+
+@lru_cache(maxsize=10_000)
+def _render_qr_svg(reservation_id: str) -> bytes:
+    img = qrcode.make(reservation_id, image_factory=qrcode.image.svg.SvgPathImage)
+    buf = io.BytesIO()
+    img.save(buf)
+    return buf.getvalue()
+
+
+@router.get("/reservations/{reservation_id}/qr", tags=["reservation"])
+async def get_reservation_qr(reservation_id: str):
+    """SVG QR code for a reservation, rendered on demand so /reserve stays DB-bound."""
+    if qrcode is None:
+        raise HTTPException(status_code=501, detail="QR rendering not available")
+    db = database.db
+    if db is None:
+        raise HTTPException(status_code=500, detail="Database not connected")
+    if not await db.reservations.find_one({"reservation_id": reservation_id}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Reservation not found")
+    svg = await asyncio.to_thread(_render_qr_svg, reservation_id)
+    return Response(content=svg, media_type="image/svg+xml")
+
+
 @router.get("/api/lots", tags=["reservation"])
 async def get_crpark_lots():
     return {"lots": crpark_manager.lots}
@@ -1,34 +1,27 @@
 # backend/routes/sensor_routes.py
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from models.schemas import SensorBatch, SensorData
+from routes.gzip_route import GzipRoute
 from services import sensor_service
-from ws.manager import manager as ws_manager
+from ws.manager import manager as ws_manager, dumps as ws_dumps
 
-import json
 import logging
 
 logger = logging.getLogger("smart_parking")
-router = APIRouter()
-
-class SensorDataModel(BaseModel):
-    slot_id: str
-    lot_id: str
-    distance: float
-    timestamp: str
-    status: str
+router = APIRouter(route_class=GzipRoute)  # devices gzip their batch uploads
 
 @router.post("/sensor-data", tags=["sensor"])
-async def receive_sensor_data(data: SensorDataModel):
+async def receive_sensor_data(data: SensorData):
     try:
-        payload = data.dict()
+        payload = data.model_dump()
         # process and update DB
-        result = await sensor_service.process_sensor_reading(payload)
-        # broadcast update to clients
-        message = json.dumps({
+        counts = await sensor_service.process_sensor_reading(payload)
+        # broadcast update to clients (counts are the lot's state after this reading)
+        message = ws_dumps({
             "type": "sensor_update",
             "lot_id": payload["lot_id"],
-            "occupied_slots": None,  # clients should request fresh lot info, or we can fetch it
-            "competitive_slots": None,
+            "occupied_slots": counts.get("occupied_slots"),
+            "competitive_slots": counts.get("competitive_slots"),
             "timestamp": payload["timestamp"]
         })
         try:
@@ -41,3 +34,33 @@ async def receive_sensor_data(data: SensorDataModel):
     except Exception as e:
         logger.exception("Sensor processing failed")
         raise HTTPException(status_code=500, detail="Sensor processing failed")
+
+@router.post("/sensor-data-batch", tags=["sensor"])
+async def receive_sensor_batch(batch: SensorBatch):
+    """All of a device's readings for one tick: one request, one update and one broadcast per lot."""
+    readings = [reading.model_dump() for reading in batch.readings]
+    try:
+        counts = await sensor_service.process_sensor_batch(readings)
+    except Exception:
+        logger.exception("Sensor batch processing failed")
+        raise HTTPException(status_code=500, detail="Sensor processing failed")
+
+    # Each lot's broadcast carries the timestamp of its last reading in the batch
+    last_seen = {reading["lot_id"]: reading["timestamp"] for reading in readings}
+    for lot_id, lot in counts.items():
+        try:
+            await ws_manager.broadcast(ws_dumps({
+                "type": "sensor_update",
+                "lot_id": lot_id,
+                "occupied_slots": lot.get("occupied_slots"),
+                "competitive_slots": lot.get("competitive_slots"),
+                "timestamp": last_seen[lot_id]
+            }))
+        except Exception as e:
+            logger.warning("Websocket broadcast failure: %s", e)
+    return {
+        "status": "success",
+        "message": "Sensor data processed",
+        "processed": sum(1 for reading in readings if reading["lot_id"] in counts),
+        "unknown_lots": sorted(last_seen.keys() - counts.keys()),
+    }
@@ -0,0 +1,34 @@
+# services/analytics_service.py
+import logging
+from services.lot_cache import lot_cache
+from services.lot_table import LotTable
+
+logger = logging.getLogger("smart_parking")
+
+# Rebuilt only when lot_cache hands out a new snapshot
+_analytics_source = None
+_analytics_cache = None
+
+def _build_analytics(lots: list) -> dict:
+    table = LotTable.from_docs(lots)
+    utilization = table.utilization
+    return {
+        lot["lot_id"]: {
+            "name": lot.get("name"),
+            "utilization": round(util, 2),
+            "efficiency": round(eff, 2),
+            "pa_i": lot.get("pa_i", 0.7),
+            "rs_i": lot.get("rs_i", 0.2),
+            "hourly_rate": lot.get("hourly_rate", 40.0)
+        }
+        for lot, util, eff in zip(lots, utilization.tolist(), (utilization * table.pa).tolist())
+    }
+
+async def get_analytics(db) -> dict:
+    """Per-lot utilization/efficiency for the current lot snapshot."""
+    global _analytics_source, _analytics_cache
+    snapshot = await lot_cache.get(db)
+    if snapshot is not _analytics_source:
+        _analytics_cache = _build_analytics(snapshot.lots)
+        _analytics_source = snapshot
+    return _analytics_cache
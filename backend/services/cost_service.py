@@ -1,68 +1,185 @@
 import numpy as np
-import requests
-from core.config import GOOGLE_MAPS_API_KEY, logger
+from functools import lru_cache
+from math import asin, cos, radians, sin, sqrt
+from cachetools import TTLCache
+from typing import Optional
+from core.config import DRIVE_TIME_CACHE_TTL, GOOGLE_MAPS_API_KEY, logger
+from services.http_client import get_http_client
+from services.lot_table import LotTable
+
+try:
+    from numba import njit, vectorize
+except ImportError:  # optional: the kernels below fall back to NumPy ufuncs
+    njit = vectorize = None
+
+COORD_QUANTUM = 1e-4  # degrees, ~11 m: nearby GPS fixes share a distance cache entry
+
+# Google Distance Matrix durations (minutes per lot) by quantized origin and lot coordinates.
+# Traffic moves, so entries expire; failed lookups are never stored and fall back to haversine.
+_google_drive_cache = TTLCache(maxsize=4096, ttl=DRIVE_TIME_CACHE_TTL)
 
 # ---- Helper functions ----
-def haversine_distance(lat1, lon1, lat2, lon2):
-    R = 6371
-    dlat = np.radians(lat2 - lat1)
-    dlng = np.radians(lon2 - lon1)
-    a = np.sin(dlat/2)**2 + np.cos(np.radians(lat1))*np.cos(np.radians(lat2))*np.sin(dlng/2)**2
-    c = 2*np.arcsin(np.sqrt(a))
-    return R * c
-
-def calculate_driving_time(current, lot):
+def _quantize(point) -> tuple:
+    return round(point["lat"] / COORD_QUANTUM), round(point["lng"] / COORD_QUANTUM)
+
+# ---- Vectorized (all lots at once) ----
+@lru_cache(maxsize=8)
+def _lot_geometry(coords: tuple) -> tuple:
+    """
+    Lot latitudes/longitudes in radians plus cos(latitude), for a tuple of (lat, lng) pairs.
+    Lot positions are fixed, so the same key recurs and the trig is done once; adding or
+    moving a lot changes the key and rebuilds it.
+    """
+    rad = np.radians(np.array(coords, dtype=np.float64).reshape(-1, 2))
+    lat_rad, lng_rad = rad[:, 0], rad[:, 1]
+    cos_lat = np.cos(lat_rad)
+    for arr in (lat_rad, lng_rad, cos_lat):
+        arr.flags.writeable = False  # shared between requests
+    return lat_rad, lng_rad, cos_lat
+
+if vectorize is not None:
+    # One fused loop per call instead of a temporary array per intermediate.
+    # No fastmath: operations run in the NumPy fallback's order, without reassociation.
+    @vectorize(["float64(float64, float64, float64, float64, float64, float64)"], cache=True)
+    def _haversine_fused(lat1r, lng1r, cos_lat1, lat2r, lng2r, cos_lat2):
+        a = sin((lat2r - lat1r) / 2) ** 2 + cos_lat1 * cos_lat2 * sin((lng2r - lng1r) / 2) ** 2
+        return 2 * 6371 * asin(sqrt(a))
+else:
+    _haversine_fused = None
+
+def haversine_vector(lat1, lng1, lat_rad, lng_rad, cos_lat):
+    """Great-circle distance (km) from one point to precomputed lot geometry in one ufunc pass."""
+    lat1r = radians(lat1)
+    if _haversine_fused is not None:
+        return _haversine_fused(lat1r, radians(lng1), cos(lat1r), lat_rad, lng_rad, cos_lat)
+    dlat = lat_rad - lat1r
+    dlng = lng_rad - radians(lng1)
+    a = np.sin(dlat / 2) ** 2 + cos(lat1r) * cos_lat * np.sin(dlng / 2) ** 2
+    return 2 * 6371 * np.arcsin(np.sqrt(a))
+
+@lru_cache(maxsize=65_536)
+def _distances_from(lat_q: int, lng_q: int, coords: tuple) -> np.ndarray:
+    """Distances (km) from a quantized point to every lot in coords."""
+    distances = haversine_vector(lat_q * COORD_QUANTUM, lng_q * COORD_QUANTUM, *_lot_geometry(coords))
+    distances.flags.writeable = False  # shared between requests
+    return distances
+
+def _cached_distances(point: dict, coords: tuple) -> np.ndarray:
+    return _distances_from(round(point["lat"] / COORD_QUANTUM), round(point["lng"] / COORD_QUANTUM), coords)
+
+async def driving_times_batch(current, coords) -> Optional[np.ndarray]:
+    """One Distance Matrix call for every lot; minutes per lot, NaN where Google had no route."""
+    key = (*_quantize(current), coords)
+    cached = _google_drive_cache.get(key)
+    if cached is not None:
+        return cached
+    url = "https://maps.googleapis.com/maps/api/distancematrix/json"
+    params = {
+        "origins": f"{current['lat']},{current['lng']}",
+        "destinations": "|".join(f"{lat},{lng}" for lat, lng in coords),
+        "mode": "driving",
+        "key": GOOGLE_MAPS_API_KEY
+    }
     try:
-        if GOOGLE_MAPS_API_KEY:
-            url = "https://maps.googleapis.com/maps/api/distancematrix/json"
-            params = {
-                "origins": f"{current['lat']},{current['lng']}",
-                "destinations": f"{lot['lat']},{lot['lng']}",
-                "mode": "driving",
-                "key": GOOGLE_MAPS_API_KEY
-            }
-            resp = requests.get(url, params=params)
-            data = resp.json()
-            if data.get("status") == "OK":
-                element = data["rows"][0]["elements"][0]
-                if element.get("status") == "OK":
-                    return element["duration"]["value"] / 60
+        data = (await get_http_client().get(url, params=params)).json()
+        if data.get("status") != "OK":
+            return None
+        times = np.array([
+            element["duration"]["value"] / 60 if element.get("status") == "OK" else np.nan
+            for element in data["rows"][0]["elements"]
+        ])
     except Exception as e:
         logger.warning(f"Google Maps API failed: {e}")
+        return None
+    times.flags.writeable = False  # shared between requests
+    _google_drive_cache[key] = times
+    return times
+
+def _cost_kernel_numpy(driving_time, walk_km, occ, res, tot, rate, pa):
+    walking_time = np.minimum(walk_km / 5 * 60, 10)
+    waiting_time = np.clip(3 + (occ + res) / tot * 5, 2, 8)
+    reservation_cost = rate + driving_time * 2.0 + walking_time * 0.5
+    competition_cost = reservation_cost + waiting_time * 3.0
+    total_cost = np.minimum(pa * reservation_cost + (1 - pa) * competition_cost, 200.0)
+    return total_cost, driving_time, walking_time, waiting_time, reservation_cost, competition_cost
+
+if njit is not None:
+    # error_model="numpy": a lot with total_slots == 0 gets inf -> max wait, as in NumPy.
+    # No fastmath: same operation order as _cost_kernel_numpy, without reassociation.
+    @njit(cache=True, error_model="numpy")
+    def cost_kernel(driving_time, walk_km, occ, res, tot, rate, pa):
+        """(total, driving, walking, waiting, reservation, competition) arrays in one fused loop."""
+        n = driving_time.shape[0]
+        out = np.empty((6, n))
+        for i in range(n):
+            walking = min(walk_km[i] / 5 * 60, 10.0)
+            waiting = min(max(3 + (occ[i] + res[i]) / tot[i] * 5, 2.0), 8.0)
+            reservation = rate[i] + driving_time[i] * 2.0 + walking * 0.5
+            competition = reservation + waiting * 3.0
+            out[0, i] = min(pa[i] * reservation + (1 - pa[i]) * competition, 200.0)
+            out[1, i] = driving_time[i]
+            out[2, i] = walking
+            out[3, i] = waiting
+            out[4, i] = reservation
+            out[5, i] = competition
+        return out
+else:
+    cost_kernel = _cost_kernel_numpy
+
+def warm_kernels():
+    """Compile (or load from the numba cache) every JIT kernel before the first request."""
+    one = np.ones(1)
+    cost_kernel(one, one, one, one, one, one, one)
+    haversine_vector(0.0, 0.0, one, one, one)
 
-    distance = haversine_distance(current["lat"], current["lng"], lot["lat"], lot["lng"])
-    return float(np.clip(distance / 30 * 60, 10, 20))  # minutes
-
-def calculate_walking_time(lot, destination):
-    distance = haversine_distance(lot["lat"], lot["lng"], destination["lat"], destination["lng"])
-    return float(min(distance / 5 * 60, 10))
-
-def calculate_expected_waiting_time(utilization):
-    base_wait = 3 + utilization * 5
-    return float(np.clip(base_wait, 2, 8))
-
-def calculate_parking_cost(request, lot: dict) -> dict:
-    driving_time = calculate_driving_time(request.current_location, lot["location"])
-    walking_time = calculate_walking_time(lot["location"], request.destination)
-    utilization = (lot["occupied_slots"] + lot["reserved_slots"]) / lot["total_slots"]
-    waiting_time = calculate_expected_waiting_time(utilization)
-
-    base_parking = lot.get("hourly_rate", 40.0)
-    driving_cost = driving_time * 2.0
-    walking_cost = walking_time * 0.5
-    waiting_cost = waiting_time * 3.0
-    reservation_cost = base_parking + driving_cost + walking_cost
-    competition_cost = reservation_cost + waiting_cost
-    pa_i = lot.get("pa_i", 0.7)
-    total_cost = pa_i * reservation_cost + (1 - pa_i) * competition_cost
-    total_cost = min(total_cost, 200.0)
+async def _parking_cost_columns(request, lots: list, use_google: bool = True, table: Optional[LotTable] = None):
+    """
+    total, driving, walking, waiting, reservation and competition cost arrays aligned with lots.
+    Pass `table` (e.g. LotSnapshot.cost_table) to reuse arrays already built for these lots.
+    """
+    current = request.current_location
+    destination = request.destination
+    if table is None:
+        table = LotTable.from_docs(lots)
+    coords = table.coords
 
+    driving_time = np.clip(_cached_distances(current, coords) / 30 * 60, 10, 20)
+    if use_google and GOOGLE_MAPS_API_KEY:
+        google_times = await driving_times_batch(current, coords)
+        if google_times is not None:
+            driving_time = np.where(np.isnan(google_times), driving_time, google_times)
+    return cost_kernel(
+        driving_time, _cached_distances(destination, coords),
+        table.occupied, table.reserved, table.total, table.hourly_rate, table.pa,
+    )
+
+def _cost_breakdowns(lots: list, columns) -> dict:
+    # tolist() hands back Python floats, so round() returns plain floats for the JSON response
+    columns = [c.tolist() for c in columns]
     return {
-        "total_cost": round(total_cost, 2),
-        "driving_time": round(driving_time, 2),
-        "walking_time": round(walking_time, 2),
-        "waiting_time": round(waiting_time, 2),
-        "reservation_cost": round(reservation_cost, 2),
-        "competition_cost": round(competition_cost, 2),
-        "success_probability": pa_i
+        lot["lot_id"]: {
+            "total_cost": round(tc, 2),
+            "driving_time": round(dt, 2),
+            "walking_time": round(wt, 2),
+            "waiting_time": round(wa, 2),
+            "reservation_cost": round(rc, 2),
+            "competition_cost": round(cc, 2),
+            "success_probability": lot.get("pa_i", 0.7)
+        }
+        for lot, tc, dt, wt, wa, rc, cc in zip(lots, *columns)
     }
+
+async def calculate_parking_costs(request, lots: list, table: Optional[LotTable] = None) -> dict:
+    """Cost breakdown for every lot, keyed by lot_id, in one pass."""
+    return _cost_breakdowns(lots, await _parking_cost_columns(request, lots, table=table))
+
+async def optimal_parking_costs(request, lots: list, table: Optional[LotTable] = None) -> tuple[str, dict]:
+    """(cheapest lot_id, calculate_parking_costs breakdown); the pick is an argmin over the totals."""
+    columns = await _parking_cost_columns(request, lots, table=table)
+    optimal_lot = lots[int(np.argmin(columns[0]))]["lot_id"]
+    return optimal_lot, _cost_breakdowns(lots, columns)
+
+async def cheapest_lot(request, lots: list, table: Optional[LotTable] = None) -> str:
+    """lot_id with the lowest total cost on haversine times alone; no breakdowns, no Google call."""
+    columns = await _parking_cost_columns(request, lots, use_google=False, table=table)
+    return lots[int(np.argmin(columns[0]))]["lot_id"]
@@ -14,14 +14,21 @@ class CRParkManagerSimple:
             "lot_002": {"Pa": 0.85, "slot_type": "C", "Tdl": 5},
             "lot_003": {"Pa": 0.95, "slot_type": "R", "Tdl": 5},
         }
+        # The decision depends only on the lot's fixed parameters, so every result is built once.
+        # Results are shared between calls and must not be mutated.
+        self._default_result = self._decide({"Pa": 0.8, "slot_type": "R", "Tdl": 5})
+        self._results = {lot_id: self._decide(params) for lot_id, params in self.lots.items()}
 
-    def process_reservation(self, lot_id: str, first_request: bool = True):
-        params = self.lots.get(lot_id, {"Pa": 0.8, "slot_type": "R", "Tdl": 5})
-        accepted = True if params["Pa"] >= 0.7 else False
-        logger.info(f"CRPark processed reservation for {lot_id}: accepted={accepted}")
+    @staticmethod
+    def _decide(params: dict) -> dict:
         return {
-            "accepted": accepted,
+            "accepted": params["Pa"] >= 0.7,
             "Pa": params["Pa"],
             "slot_type": params["slot_type"],
             "Tdl": params["Tdl"]
         }
+
+    def process_reservation(self, lot_id: str, first_request: bool = True):
+        result = self._results.get(lot_id, self._default_result)
+        logger.info(f"CRPark processed reservation for {lot_id}: accepted={result['accepted']}")
+        return result
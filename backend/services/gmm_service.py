@@ -1,29 +1,100 @@
 # services/gmm_service.py
 from sklearn.mixture import GaussianMixture
+import joblib
 import numpy as np
 import logging
+import os
+from core.config import GMM_MODEL_PATH
 
 logger = logging.getLogger("smart_parking")
 
+# hour and day are drawn independently, so a diagonal covariance loses nothing
+GMM_COVARIANCE_TYPE = "diag"
+
+HOURS, DAYS = 24, 7  # the whole (hour, day) feature domain
+
 gmm_model = None
+_gmm_params = None  # (precision std-devs, projected means, log_norm) of the trained model
+_posterior_table = None  # (HOURS, DAYS, k) posteriors for every in-domain feature
+
+def _posterior_params(model: GaussianMixture):
+    """Per-component constants of the diagonal-covariance log density, computed once per fit."""
+    n_features = model.means_.shape[1]
+    prec_chol = model.precisions_cholesky_  # (k, d): 1 / sigma per feature
+    log_det = np.log(prec_chol).sum(axis=1)
+    log_norm = np.log(model.weights_) + log_det - 0.5 * n_features * np.log(2 * np.pi)
+    return prec_chol, model.means_ * prec_chol, log_norm
+
+def _predict_proba(x: np.ndarray) -> np.ndarray:
+    """predict_proba for an (n, 2) array without sklearn's per-call input validation."""
+    prec_chol, means_proj, log_norm = _gmm_params
+    # y[n, k] = (x_n - mu_k) / sigma_k, elementwise
+    y = x[:, None, :] * prec_chol - means_proj
+    log_prob = log_norm - 0.5 * np.einsum("nke,nke->nk", y, y)
+    log_prob -= log_prob.max(axis=1, keepdims=True)
+    prob = np.exp(log_prob)
+    return prob / prob.sum(axis=1, keepdims=True)
+
+def _set_model(model: GaussianMixture):
+    """Install a fitted model and score all 168 (hour, day) features in one pass."""
+    global gmm_model, _gmm_params, _posterior_table
+    params = _posterior_params(model)
+    hours, days = np.meshgrid(np.arange(HOURS), np.arange(DAYS), indexing="ij")
+    grid = np.column_stack([hours.ravel(), days.ravel()]).astype(np.float64)
+    gmm_model, _gmm_params = model, params
+    table = _predict_proba(grid).reshape(HOURS, DAYS, -1)
+    table.setflags(write=False)  # shared between callers
+    _posterior_table = table
 
 def train_gmm(n_components: int = 3, random_state: int = 42):
     """Train a simple GMM on synthetic hour/day features (used for demo)."""
-    global gmm_model
-    np.random.seed(random_state)
-    hours = np.random.randint(0, 24, 1000)
-    days = np.random.randint(0, 7, 1000)
+    # Local PCG64 generator: reproducible without reseeding NumPy's global state
+    rng = np.random.default_rng(random_state)
+    hours = rng.integers(0, 24, 1000)
+    days = rng.integers(0, 7, 1000)
     features = np.column_stack([hours, days])
-    gmm_model = GaussianMixture(n_components=n_components, random_state=random_state)
-    gmm_model.fit(features)
+    model = GaussianMixture(
+        n_components=n_components, covariance_type=GMM_COVARIANCE_TYPE, random_state=random_state
+    )
+    model.fit(features)
+    _set_model(model)
     logger.info("✅ GMM model trained successfully")
-    return gmm_model
+    return model
+
+def load_or_train_gmm(path: str = GMM_MODEL_PATH, n_components: int = 3):
+    """Load the persisted GMM; fit and save it when missing, unreadable or stale."""
+    try:
+        model = joblib.load(path)
+        if model.covariance_type != GMM_COVARIANCE_TYPE or model.n_components != n_components:
+            raise ValueError("saved model has different settings")
+    except FileNotFoundError:
+        model = None
+    except Exception as e:
+        logger.warning("⚠️ Ignoring saved GMM model at %s: %s", path, e)
+        model = None
+    if model is None:
+        model = train_gmm(n_components=n_components)
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            joblib.dump(model, path)
+        except OSError as e:
+            logger.warning("⚠️ Could not save GMM model to %s: %s", path, e)
+        return model
+    _set_model(model)
+    logger.info("✅ GMM model loaded from %s", path)
+    return model
 
 def predict_gmm(hour:int, day:int):
     """Return GMM posterior for a simple (hour, day) feature."""
-    global gmm_model
-    if gmm_model is None:
+    if _posterior_table is None:
+        raise RuntimeError("GMM model not trained")
+    hour, day = int(hour), int(day)
+    if 0 <= hour < HOURS and 0 <= day < DAYS:
+        return _posterior_table[hour, day:day + 1]  # (1, k) read-only view
+    return _predict_proba(np.array([[hour, day]], dtype=np.float64))
+
+def predict_gmm_batch(hours, days) -> np.ndarray:
+    """(n, k) posteriors for arrays of in-domain hours and days, by table lookup."""
+    if _posterior_table is None:
         raise RuntimeError("GMM model not trained")
-    x = np.array([[hour, day]])
-    probs = gmm_model.predict_proba(x)
-    return probs
+    return _posterior_table[np.asarray(hours, dtype=np.intp), np.asarray(days, dtype=np.intp)]
@@ -0,0 +1,28 @@
+# services/http_client.py
+from typing import Optional
+import httpx
+
+try:
+    import h2  # noqa: F401  (installed by httpx[http2])
+    HTTP2_AVAILABLE = True
+except ImportError:  # optional: fall back to HTTP/1.1 keep-alive
+    HTTP2_AVAILABLE = False
+
+HTTP_TIMEOUT = httpx.Timeout(5.0)
+HTTP_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=32)
+
+# Shared across requests so Google API calls reuse pooled connections (one TLS handshake per
+# host, multiplexed over HTTP/2 when available); created on first use, closed by the app lifespan
+_http_client: Optional[httpx.AsyncClient] = None
+
+def get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(http2=HTTP2_AVAILABLE, timeout=HTTP_TIMEOUT, limits=HTTP_LIMITS)
+    return _http_client
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
@@ -0,0 +1,87 @@
+# services/lot_cache.py
+import asyncio
+import time
+import logging
+from functools import cached_property
+
+from services.lot_table import LotTable
+
+logger = logging.getLogger("smart_parking")
+
+LOT_CACHE_TTL = 2.0  # seconds; bounds staleness for writes made by other workers
+
+LOT_FETCH_LIMIT = 500
+
+# Fields the lot endpoints and the cost/analytics models read; _id is never returned to clients
+LOT_PROJECTION = {
+    "_id": 0, "lot_id": 1, "name": 1, "address": 1, "location": 1, "features": 1,
+    "total_slots": 1, "occupied_slots": 1, "reserved_slots": 1, "competitive_slots": 1,
+    "hourly_rate": 1, "pa_i": 1, "rs_i": 1, "loc_lat": 1, "loc_lng": 1,
+}
+
+# Fallbacks the cost model needs when a lot document omits them
+_COST_DEFAULTS = (
+    ("occupied_slots", 1),
+    ("reserved_slots", 0),
+    ("total_slots", 10),
+    ("hourly_rate", 40.0),
+    ("pa_i", 0.7),
+)
+
+
+class LotSnapshot:
+    """One read of parking_lots: `lots` as stored, `cost_lots` with cost defaults, `by_id` index."""
+
+    def __init__(self, lots: list):
+        self.lots = lots
+        self.by_id = {lot.get("lot_id"): lot for lot in lots}
+        self.cost_lots = [
+            {**lot, **{key: lot.get(key, default) for key, default in _COST_DEFAULTS}}
+            for lot in lots
+        ]
+
+    @cached_property
+    def cost_table(self) -> LotTable:
+        """cost_lots as arrays, built once per snapshot so repeat cost queries skip the conversion."""
+        return LotTable.from_docs(self.cost_lots)
+
+
+class LotCache:
+    """
+    In-process parking_lots snapshot shared by the read endpoints.
+    Writers in this process call invalidate(); the TTL covers everyone else.
+    Snapshots are shared between requests and must not be mutated.
+    """
+
+    def __init__(self, ttl: float = LOT_CACHE_TTL):
+        self.ttl = ttl
+        self._snapshot = None
+        self._loaded_at = 0.0
+        self._generation = 0  # bumped by invalidate() so an in-flight load is not kept
+        self._lock = asyncio.Lock()
+
+    def _fresh(self) -> bool:
+        return self._snapshot is not None and time.monotonic() - self._loaded_at < self.ttl
+
+    def invalidate(self) -> None:
+        self._snapshot = None
+        self._generation += 1
+
+    async def get(self, db) -> LotSnapshot:
+        if self._fresh():
+            return self._snapshot
+        async with self._lock:  # one reload however many requests miss together
+            if self._fresh():
+                return self._snapshot
+            generation = self._generation
+            docs = await db.parking_lots.find({}, LOT_PROJECTION).to_list(length=LOT_FETCH_LIMIT)
+            # Locations are stored normalized (DatabaseManager.migrate_lot_locations)
+            snapshot = LotSnapshot(docs)
+            if generation == self._generation:
+                self._snapshot = snapshot
+                self._loaded_at = time.monotonic()
+            return snapshot
+
+
+# Shared instance for global import
+lot_cache = LotCache()
@@ -0,0 +1,63 @@
+# services/lot_table.py
+from dataclasses import dataclass, field
+from functools import cached_property
+
+import numpy as np
+
+# (attribute, lot document field, default when missing or null)
+_COLUMNS = (
+    ("occupied", "occupied_slots", 0.0),
+    ("reserved", "reserved_slots", 0.0),
+    ("competitive", "competitive_slots", 0.0),
+    ("total", "total_slots", 0.0),
+    ("hourly_rate", "hourly_rate", 40.0),
+    ("pa", "pa_i", 0.7),
+    ("rs", "rs_i", 0.2),
+    ("lat", "loc_lat", 12.9716),  # default: central Bengaluru
+    ("lng", "loc_lng", 77.5946),
+)
+
+@dataclass
+class LotTable:
+    """Numeric lot state as parallel float64 arrays (struct-of-arrays), indexed like `ids`."""
+    ids: list
+    occupied: np.ndarray
+    reserved: np.ndarray
+    competitive: np.ndarray
+    total: np.ndarray
+    hourly_rate: np.ndarray
+    pa: np.ndarray
+    rs: np.ndarray
+    lat: np.ndarray
+    lng: np.ndarray
+    index: dict = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.index = {lot_id: i for i, lot_id in enumerate(self.ids)}
+
+    @classmethod
+    def from_docs(cls, lots: list) -> "LotTable":
+        """One pass per column over parking_lots documents."""
+        n = len(lots)
+        columns = {
+            attr: np.fromiter(
+                (default if lot.get(key) is None else lot[key] for lot in lots),
+                dtype=np.float64, count=n,
+            )
+            for attr, key, default in _COLUMNS
+        }
+        ids = [lot.get("lot_id") or f"lot_{lot.get('_id', 'unknown')}" for lot in lots]
+        return cls(ids=ids, **columns)
+
+    @cached_property
+    def coords(self) -> tuple:
+        """((lat, lng), ...) per lot; the key of the cost_service geometry and distance caches."""
+        return tuple(zip(self.lat.tolist(), self.lng.tolist()))
+
+    @property
+    def utilization(self) -> np.ndarray:
+        """(occupied + reserved) / total, 0 for lots without slots."""
+        return np.divide(
+            self.occupied + self.reserved, self.total,
+            out=np.zeros_like(self.total), where=self.total > 0,
+        )
@@ -1,23 +1,27 @@
 # services/optimization_service.py
 import numpy as np
-from datetime import datetime
 import logging
+from typing import Dict, Optional
 
 logger = logging.getLogger("smart_parking")
 
-def simulated_annealing_vns(lot_ids=None):
-    """Mock optimization algorithm returning pa_i and rs_i for lot ids."""
-    if lot_ids is None:
-        lot_ids = ["lot_001", "lot_002", "lot_003", "lot_004", "lot_005", "lot_006", "lot_007", "lot_008"]
-    params = {}
-    for lot_id in lot_ids:
-        params[lot_id] = {
-            "pa_i": round(np.clip(np.random.uniform(0.6, 0.9), 0, 1), 2),
-            "rs_i": round(np.clip(np.random.uniform(0.1, 0.3), 0, 1), 2),
-        }
+_rng = np.random.default_rng()
+
+def random_parameters(lot_ids, seed: Optional[int] = None) -> Dict[str, dict]:
+    """Placeholder pa_i ~ U(0.6, 0.9), rs_i ~ U(0.1, 0.3) per lot id; seeded draws are reproducible."""
+    rng = _rng if seed is None else np.random.default_rng(seed)
+    n = len(lot_ids)
+    pa = np.round(rng.uniform(0.6, 0.9, n), 2).tolist()
+    rs = np.round(rng.uniform(0.1, 0.3, n), 2).tolist()
+    return {lot_id: {"pa_i": p, "rs_i": r} for lot_id, p, r in zip(lot_ids, pa, rs)}
+
+def simulated_annealing_vns(lots, seed: Optional[int] = None) -> Dict[str, dict]:
+    """
+    Mock SA-VNS: placeholder pa_i/rs_i for each lot document, {lot_id: {"pa_i", "rs_i"}}.
+    There is no objective that trades pa_i against rs_i yet, so nothing is searched
+    and callers must not persist these values as tuned lot parameters.
+    """
+    lot_ids = [lot.get("lot_id") or f"lot_{lot.get('_id', 'unknown')}" for lot in lots]
+    params = random_parameters(lot_ids, seed)
     logger.info("✅ Optimization simulated (SA-VNS) and parameters generated")
-    return {
-        "timestamp": datetime.utcnow(),
-        "parameters": params,
-        "status": "completed"
-    }
+    return params
@@ -1,10 +1,76 @@
 # services/sensor_service.py
-from datetime import datetime
+from collections import deque
+from datetime import datetime, timezone
+import asyncio
 import logging
+from pymongo import ReturnDocument
 from core import database
+from services.lot_cache import lot_cache
 
 logger = logging.getLogger("smart_parking")
 
+SENSOR_FLUSH_SIZE = 100  # flush as soon as this many readings are buffered
+SENSOR_FLUSH_INTERVAL = 0.1  # seconds between background flushes
+
+# Lot counters as aggregation expressions (missing fields count as 0)
+_OCCUPIED = {"$ifNull": ["$occupied_slots", 0]}
+_RESERVED = {"$ifNull": ["$reserved_slots", 0]}
+_TOTAL = {"$ifNull": ["$total_slots", 0]}
+
+_CAPACITY = {"$max": [0, {"$subtract": [_TOTAL, _RESERVED]}]}  # slots a sensor may mark occupied
+
+def _occupancy_step(status: str, current) -> dict:
+    """occupied_slots after one reading: a car arriving only counts while non-reserved capacity
+    is left, one leaving only while any are counted."""
+    if status == "occupied":
+        return {"$cond": [{"$lt": [current, _CAPACITY]}, {"$add": [current, 1]}, current]}
+    return {"$cond": [{"$gt": [current, 0]}, {"$subtract": [current, 1]}, current]}
+
+# New occupied_slots per reading status; other statuses leave it unchanged
+_OCCUPANCY_STEP = {status: _occupancy_step(status, _OCCUPIED) for status in ("occupied", "free")}
+
+# Several readings for one lot applied in order, each with the single-reading bounds
+_OCCUPANCY_FOLD = {"$switch": {
+    "branches": [
+        {"case": {"$eq": ["$$this", status]}, "then": _occupancy_step(status, "$$value")}
+        for status in _OCCUPANCY_STEP
+    ],
+    "default": "$$value",
+}}
+
+def _lot_update(occupied, now: datetime) -> list:
+    """Update pipeline: set occupied_slots to the given expression and rederive competitive_slots."""
+    return [
+        {"$set": {"occupied_slots": occupied, "updated_at": now}},
+        {"$set": {"competitive_slots": {"$max": [
+            {"$subtract": [_TOTAL, {"$add": [_RESERVED, _OCCUPIED]}]}, 0,
+        ]}}},
+    ]
+
+_COUNTS_PROJECTION = {"_id": 0, "occupied_slots": 1, "competitive_slots": 1}
+
+# sensor_data documents waiting for the next insert_many
+_sensor_buffer: deque = deque()
+
+async def flush_sensor_buffer():
+    """Write every buffered reading in one unordered insert_many."""
+    db = database.db
+    if not _sensor_buffer or db is None:
+        return
+    # No await between copy and clear, so nothing appended in between is lost
+    docs = list(_sensor_buffer)
+    _sensor_buffer.clear()
+    try:
+        await db.sensor_data.insert_many(docs, ordered=False)
+    except Exception as e:
+        logger.warning("Sensor buffer flush of %d readings failed: %s", len(docs), e)
+
+async def run_sensor_flusher():
+    """Background task: flush the buffer every SENSOR_FLUSH_INTERVAL seconds."""
+    while True:
+        await asyncio.sleep(SENSOR_FLUSH_INTERVAL)
+        await flush_sensor_buffer()
+
 async def process_sensor_reading(reading: dict):
     """
     reading: {
@@ -14,52 +80,86 @@ async def process_sensor_reading(reading: dict):
       "timestamp": iso-str or datetime,
       "status": "occupied"|"free"
     }
-    Updates parking_lots counts and inserts sensor_data document.
+    Updates parking_lots counts, buffers the sensor_data document and returns the lot's new
+    {"occupied_slots", "competitive_slots"}.
     """
     db = database.db
     if db is None:
         raise RuntimeError("Database not connected")
 
-    lot = await db.parking_lots.find_one({"lot_id": reading["lot_id"]})
+    status = reading.get("status")
+    now = datetime.now(timezone.utc)
+    # One atomic round trip: the bounds checks run server-side, and the post-update counts come
+    # back for the broadcast. No match means the lot does not exist.
+    lot = await db.parking_lots.find_one_and_update(
+        {"lot_id": reading["lot_id"]},
+        _lot_update(_OCCUPANCY_STEP.get(status, _OCCUPIED), now),
+        projection=_COUNTS_PROJECTION,
+        return_document=ReturnDocument.AFTER,
+    )
     if not lot:
         raise ValueError("Parking lot not found")
+    lot_cache.invalidate()
 
-    occupied = int(lot.get("occupied_slots", 0))
-    reserved = int(lot.get("reserved_slots", 0))
-    total = int(lot.get("total_slots", 0))
+    await _buffer_readings([reading], now)
+    logger.info(f"✅ Processed sensor reading for {reading['lot_id']}")
+    return lot
 
-    status = reading.get("status")
-    if status == "occupied" and occupied < max(0, total - reserved):
-        occupied += 1
-    elif status == "free" and occupied > 0:
-        occupied -= 1
+async def process_sensor_batch(readings: list) -> dict:
+    """
+    Several readings (process_sensor_reading's shape) in one call: one atomic update per lot, run
+    concurrently, applying that lot's readings in order. Returns {lot_id: counts} for the lots
+    that exist; readings for unknown lots are dropped.
+    """
+    db = database.db
+    if db is None:
+        raise RuntimeError("Database not connected")
 
-    competitive = max(total - reserved - occupied, 0)
+    now = datetime.now(timezone.utc)
+    by_lot: dict = {}
+    for reading in readings:
+        by_lot.setdefault(reading["lot_id"], []).append(reading)
 
-    await db.parking_lots.update_one(
-        {"lot_id": reading["lot_id"]},
-        {"$set": {
-            "occupied_slots": occupied,
-            "competitive_slots": competitive,
-            "updated_at": datetime.utcnow()
-        }}
-    )
+    def fold(lot_readings):
+        # Only known statuses go into the array: its elements are evaluated as expressions
+        statuses = [r.get("status") for r in lot_readings if r.get("status") in _OCCUPANCY_STEP]
+        return {"$reduce": {"input": statuses, "initialValue": _OCCUPIED, "in": _OCCUPANCY_FOLD}}
 
-    # Normalize timestamp
+    lots = await asyncio.gather(*(
+        db.parking_lots.find_one_and_update(
+            {"lot_id": lot_id},
+            _lot_update(fold(lot_readings), now),
+            projection=_COUNTS_PROJECTION,
+            return_document=ReturnDocument.AFTER,
+        )
+        for lot_id, lot_readings in by_lot.items()
+    ))
+    counts = {lot_id: lot for lot_id, lot in zip(by_lot, lots) if lot}
+    if counts:
+        lot_cache.invalidate()
+        await _buffer_readings([r for lot_id in counts for r in by_lot[lot_id]], now)
+    logger.info(f"✅ Processed {len(readings)} sensor readings for {len(counts)} lots")
+    return counts
+
+def _sensor_doc(reading: dict, now: datetime) -> dict:
+    # Normalize timestamp (required: it is the time series timeField)
     ts = reading.get("timestamp")
     if isinstance(ts, str):
         try:
             ts = datetime.fromisoformat(ts)
         except Exception:
-            ts = datetime.utcnow()
+            ts = None
+    if ts is None:
+        ts = now
 
-    doc = {
-        "slot_id": reading["slot_id"],
-        "lot_id": reading["lot_id"],
+    return {
+        "meta": {"lot_id": reading["lot_id"], "slot_id": reading["slot_id"]},
         "distance": float(reading.get("distance", 0)),
         "timestamp": ts,
-        "status": status,
+        "status": reading.get("status"),
     }
-    await db.sensor_data.insert_one(doc)
-    logger.info(f"✅ Processed sensor reading for {reading['lot_id']}")
-    return {"status": "success"}
+
+async def _buffer_readings(readings: list, now: datetime):
+    _sensor_buffer.extend(_sensor_doc(reading, now) for reading in readings)
+    if len(_sensor_buffer) >= SENSOR_FLUSH_SIZE:
+        await flush_sensor_buffer()
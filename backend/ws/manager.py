@@ -1,37 +1,94 @@
 # backend/websocket/manager.py
 from fastapi import WebSocket
+import asyncio
+import contextlib
 import logging
+import orjson
+
+from core.config import WS_SEND_QUEUE_SIZE
 
 logger = logging.getLogger("websocket_manager")
 
+# Naive datetimes in this app are UTC; numpy scalars come out of the cost/optimizer kernels
+WS_JSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z | orjson.OPT_SERIALIZE_NUMPY
+
+
+def dumps(payload: dict) -> bytes:
+    """Serialize a broadcast payload once, datetimes included."""
+    return orjson.dumps(payload, option=WS_JSON_OPTIONS)
+
+
 class ConnectionManager:
-    """Manages WebSocket connections and broadcasts messages to all active clients."""
+    """
+    Tracks WebSocket clients and fans broadcasts out to them.
+    Each client has a bounded send queue drained by its own task, so broadcast() never waits on
+    a socket and one slow client cannot hold up the others; a client whose queue fills is dropped.
+    Socket writes run on the server's event loop: uvloop when started via main.py.
+    """
 
     def __init__(self):
         # List of all currently connected websocket clients
-        self.active_connections: list[WebSocket] = []
+        self.active_connections: set[WebSocket] = set()
+        self._queues: dict[WebSocket, asyncio.Queue] = {}
+        self._senders: dict[WebSocket, asyncio.Task] = {}
 
     async def connect(self, websocket: WebSocket):
-        """Accepts a new WebSocket connection."""
+        """Accepts a new WebSocket connection and starts its sender task."""
         await websocket.accept()
-        self.active_connections.append(websocket)
+        self.active_connections.add(websocket)
+        queue = asyncio.Queue(maxsize=WS_SEND_QUEUE_SIZE)
+        self._queues[websocket] = queue
+        self._senders[websocket] = asyncio.create_task(self._sender(websocket, queue))
         logger.info(f"🟢 WebSocket connected ({len(self.active_connections)} clients)")
 
     def disconnect(self, websocket: WebSocket):
-        """Removes a disconnected WebSocket."""
+        """Removes a disconnected WebSocket and stops its sender (safe to call twice)."""
         if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+            self.active_connections.discard(websocket)
             logger.info(f"🔴 WebSocket disconnected ({len(self.active_connections)} clients)")
+        self._queues.pop(websocket, None)
+        sender = self._senders.pop(websocket, None)
+        if sender is not None and sender is not asyncio.current_task():
+            sender.cancel()
+
+    async def _sender(self, websocket: WebSocket, queue: asyncio.Queue):
+        """Drains one client's queue; a failed send drops the client."""
+        try:
+            while True:
+                await websocket.send(await queue.get())
+        except asyncio.CancelledError:
+            # Dropped while still open (slow client): close it; a no-op error if already closed
+            with contextlib.suppress(Exception):
+                await websocket.close(code=1013)  # try again later
+            raise
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to send to a client: {e}")
+            self.disconnect(websocket)
 
-    async def broadcast(self, message: str):
-        """Broadcasts a message to all active WebSocket clients."""
+    async def broadcast(self, message: str | bytes):
+        """Queues a message for every active WebSocket client."""
+        if isinstance(message, bytes):
+            # Decode orjson output once; clients JSON.parse text frames, not binary ones
+            message = message.decode("utf-8")
+        # One ASGI send message shared by every client's queue instead of a send_text() per client
+        frame = {"type": "websocket.send", "text": message}
         logger.info(f"📡 Broadcasting message to {len(self.active_connections)} clients")
-        for connection in list(self.active_connections):  # use copy to avoid runtime modification
+        behind = []  # dropped after the loop: disconnect() mutates _queues
+        for connection, queue in self._queues.items():
             try:
-                await connection.send_text(message)
-            except Exception as e:
-                logger.warning(f"⚠️ Failed to send to a client: {e}")
-                self.disconnect(connection)
+                queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                behind.append(connection)
+        for connection in behind:
+            logger.warning("⚠️ Dropping a WebSocket client that fell too far behind")
+            self.disconnect(connection)
+
+    async def close_all(self):
+        """Drops every client at shutdown; the sender tasks close their sockets concurrently."""
+        senders = list(self._senders.values())
+        for connection in list(self.active_connections):
+            self.disconnect(connection)
+        await asyncio.gather(*senders, return_exceptions=True)
 
 
 # Shared instance for global import
@@ -0,0 +1,33 @@
+"""
+Per-tick sensor kernels for the IoT simulators
+Uses Numba when installed, NumPy otherwise
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # optional: compute_tick falls back to NumPy array ops
+    njit = None
+
+
+if njit is not None:
+    # One fused loop for noise, clip, rounding and threshold; a tick is only tens
+    # of sensors, so it runs serially rather than on a parallel thread pool.
+    @njit(cache=True, fastmath=True)
+    def compute_tick(base, noise, threshold, out_dist, out_occ):
+        for i in range(base.size):
+            d = base[i] + noise[i]
+            d = 0.0 if d < 0 else d
+            out_dist[i] = round(d, 2)
+            out_occ[i] = out_dist[i] < threshold[i]
+else:
+    def compute_tick(base, noise, threshold, out_dist, out_occ):
+        np.round(np.maximum(0, base + noise), 2, out=out_dist)
+        np.less(out_dist, threshold, out=out_occ)
+
+
+def warm_up():
+    """Compile compute_tick ahead of the monitoring loop (no-op without Numba)"""
+    one = np.zeros(1)
+    compute_tick(one, one, one, np.empty(1), np.empty(1, dtype=np.bool_))
@@ -2,12 +2,15 @@ import random
 import time
 import json
 import requests
+import orjson
 from datetime import datetime
 import threading
 import logging
+import os
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+# SIM_LOG_LEVEL=WARNING silences the per-reading INFO lines on long runs
+logging.basicConfig(level=os.getenv("SIM_LOG_LEVEL", "INFO").upper())
 logger = logging.getLogger(__name__)
 
 class UltrasonicSensor:
@@ -42,6 +45,10 @@ class ESP8266NodeMCU:
         self.wifi_ssid = wifi_ssid
         self.wifi_password = wifi_password
         self.api_endpoint = api_endpoint
+        # Built once; every POST reuses them
+        self.data_url = f"{api_endpoint}/sensor-data"
+        self.heartbeat_url = f"{api_endpoint}/device-heartbeat"
+        self.headers = {'Content-Type': 'application/json', 'User-Agent': f'ESP8266-{device_id}'}
         self.sensors = []
         self.is_connected = False
         self.last_heartbeat = datetime.now()
@@ -53,38 +60,32 @@ class ESP8266NodeMCU:
     def connect_wifi(self):
         """Simulate WiFi connection"""
         logger.info(f"Device {self.device_id}: Connecting to WiFi {self.wifi_ssid}")
-        time.sleep(2)  # Simulate connection time
         self.is_connected = True
         logger.info(f"Device {self.device_id}: WiFi connected successfully")
         
     def send_sensor_data(self, sensor_data):
         """Send sensor data to backend API"""
         if not self.is_connected:
-            logger.warning(f"Device {self.device_id}: Not connected to WiFi")
+            logger.warning("Device %s: Not connected to WiFi", self.device_id)
             return False
             
         try:
-            headers = {
-                'Content-Type': 'application/json',
-                'User-Agent': f'ESP8266-{self.device_id}'
-            }
-            
             response = requests.post(
-                f"{self.api_endpoint}/sensor-data",
-                json=sensor_data,
-                headers=headers,
+                self.data_url,
+                data=orjson.dumps(sensor_data),
+                headers=self.headers,
                 timeout=5
             )
             
             if response.status_code == 200:
-                logger.info(f"Device {self.device_id}: Data sent successfully")
+                logger.info("Device %s: Data sent successfully", self.device_id)
                 return True
             else:
-                logger.error(f"Device {self.device_id}: Failed to send data - Status: {response.status_code}")
+                logger.error("Device %s: Failed to send data - Status: %s", self.device_id, response.status_code)
                 return False
                 
         except requests.exceptions.RequestException as e:
-            logger.error(f"Device {self.device_id}: Network error - {str(e)}")
+            logger.error("Device %s: Network error - %s", self.device_id, e)
             return False
     
     def send_heartbeat(self):
@@ -99,21 +100,21 @@ class ESP8266NodeMCU:
         
         try:
             response = requests.post(
-                f"{self.api_endpoint}/device-heartbeat",
+                self.heartbeat_url,
                 json=heartbeat_data,
                 timeout=5
             )
             
             if response.status_code == 200:
                 self.last_heartbeat = datetime.now()
-                logger.debug(f"Device {self.device_id}: Heartbeat sent")
+                logger.debug("Device %s: Heartbeat sent", self.device_id)
                 return True
             else:
-                logger.warning(f"Device {self.device_id}: Heartbeat failed")
+                logger.warning("Device %s: Heartbeat failed", self.device_id)
                 return False
                 
         except requests.exceptions.RequestException as e:
-            logger.error(f"Device {self.device_id}: Heartbeat error - {str(e)}")
+            logger.error("Device %s: Heartbeat error - %s", self.device_id, e)
             return False
 
 class ParkingSlotSensor:
@@ -130,20 +131,21 @@ class ParkingSlotSensor:
         
     def read_status(self):
         """Read current slot status"""
-        is_occupied = self.sensor.is_occupied()
-        current_status = "occupied" if is_occupied else "free"
+        # One measurement decides the status and is the distance reported with it
+        distance = self.sensor.measure_distance()
+        current_status = "occupied" if distance < self.sensor.distance_threshold else "free"
         
         # Detect status change
         if current_status != self.last_status:
             self.status_change_time = datetime.now()
             self.last_status = current_status
-            logger.info(f"Slot {self.slot_id}: Status changed to {current_status}")
+            logger.info("Slot %s: Status changed to %s", self.slot_id, current_status)
             
         return {
             "slot_id": self.slot_id,
             "lot_id": self.lot_id,
-            "distance": self.sensor.measure_distance(),
-            "timestamp": datetime.now().isoformat(),
+            "distance": distance,
+            "ts_ns": time.time_ns(),  # the backend turns it into the reading's timestamp
             "status": current_status,
             "device_id": self.device_id,
             "sensor_index": self.sensor_index
@@ -157,6 +159,7 @@ class IoTDeviceManager:
         self.devices = {}
         self.slots = {}
         self.running = False
+        self._dispatch = []  # (device.send_sensor_data, sensors) per device, walked every tick
         
     def create_device(self, device_id, lot_id, slot_count, wifi_ssid="SmartPark_WiFi", wifi_password="parking123"):
         """Create a new IoT device with sensors"""
@@ -183,6 +186,7 @@ class IoTDeviceManager:
             self.slots[slot_id] = slot_sensor
             
         self.devices[device_id] = device
+        self._dispatch.append((device.send_sensor_data, tuple(device.sensors)))
         logger.info(f"Created device {device_id} with {slot_count} sensors for lot {lot_id}")
         
     def start_monitoring(self, interval=5):
@@ -209,16 +213,12 @@ class IoTDeviceManager:
         """Main monitoring loop"""
         while self.running:
             try:
-                for device_id, device in self.devices.items():
-                    if device.is_connected:
-                        for sensor in device.sensors:
-                            sensor_data = sensor.read_status()
-                            
-                            # Send data to backend
-                            success = device.send_sensor_data(sensor_data)
-                            
-                            if not success:
-                                logger.warning(f"Failed to send data for sensor {sensor.slot_id}")
+                # send_sensor_data itself refuses while the device is disconnected
+                for send, sensors in self._dispatch:
+                    for sensor in sensors:
+                        # Send data to backend
+                        if not send(sensor.read_status()):
+                            logger.warning("Failed to send data for sensor %s", sensor.slot_id)
                                 
                 time.sleep(interval)
                 
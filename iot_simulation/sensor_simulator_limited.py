@@ -4,22 +4,39 @@ Smart Parking IoT Sensor Simulation - Limited Time Version
 Runs for a specified duration then stops automatically
 """
 
+import asyncio
+import gzip
 import random
 import time
 import json
-import requests
+import httpx
+import orjson
+import numpy as np
+from kernels import compute_tick, warm_up
 from datetime import datetime
 import threading
 import logging
+import os
 import sys
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+# SIM_LOG_LEVEL=WARNING silences the per-reading INFO lines on long runs
+logging.basicConfig(level=os.getenv("SIM_LOG_LEVEL", "INFO").upper())
 logger = logging.getLogger(__name__)
 
+# One keep-alive pool shared by every device; a tick's POSTs all go out concurrently on it
+HTTP_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=32)
+HTTP_TIMEOUT = 5.0
+HTTP_RETRIES = 2  # connection attempts retried by the transport
+BATCH_READINGS = True  # one /sensor-data-batch POST per device per tick; off: one POST per sensor
+HEARTBEAT_EVERY = 20  # ticks between resends of unchanged slots; other ticks send only status changes
+GZIP_LEVEL = 1  # batch bodies are gzipped; level 1 keeps the client CPU cost low
+
 class UltrasonicSensor:
     """Simulates HC-SR04 Ultrasonic Sensor"""
     
+    __slots__ = ('trigger_pin', 'echo_pin', 'distance_threshold')
+    
     def __init__(self, trigger_pin, echo_pin):
         self.trigger_pin = trigger_pin
         self.echo_pin = echo_pin
@@ -44,14 +61,26 @@ class UltrasonicSensor:
 class ESP8266NodeMCU:
     """Simulates ESP8266 NodeMCU microcontroller"""
     
+    __slots__ = (
+        'device_id', 'wifi_ssid', 'wifi_password', 'api_endpoint', 'sensors', 'is_connected',
+        'batch_supported', 'last_heartbeat', 'client', 'headers', 'batch_headers', 'data_url', 'batch_url',
+    )
+    
     def __init__(self, device_id, wifi_ssid, wifi_password, api_endpoint):
         self.device_id = device_id
         self.wifi_ssid = wifi_ssid
         self.wifi_password = wifi_password
         self.api_endpoint = api_endpoint
+        # Parsed once; every POST reuses them
+        self.data_url = httpx.URL(f"{api_endpoint}/sensor-data")
+        self.batch_url = httpx.URL(f"{api_endpoint}/sensor-data-batch")
         self.sensors = []
         self.is_connected = False
+        self.batch_supported = BATCH_READINGS  # cleared when the backend has no batch endpoint
         self.last_heartbeat = datetime.now()
+        self.client = None  # shared httpx.AsyncClient, set by IoTDeviceManager while monitoring
+        self.headers = {'Content-Type': 'application/json', 'User-Agent': f'ESP8266-{self.device_id}'}
+        self.batch_headers = {**self.headers, 'Content-Encoding': 'gzip'}
         
     def add_sensor(self, sensor):
         """Add ultrasonic sensor to the device"""
@@ -60,43 +89,70 @@ class ESP8266NodeMCU:
     def connect_wifi(self):
         """Simulate WiFi connection"""
         logger.info(f"Device {self.device_id}: Connecting to WiFi {self.wifi_ssid}")
-        time.sleep(2)  # Simulate connection time
         self.is_connected = True
         logger.info(f"Device {self.device_id}: WiFi connected successfully")
         
-    def send_sensor_data(self, sensor_data):
+    async def send_sensor_data(self, sensor_data):
         """Send sensor data to backend API"""
         if not self.is_connected:
-            logger.warning(f"Device {self.device_id}: Not connected to WiFi")
+            logger.warning("Device %s: Not connected to WiFi", self.device_id)
             return False
             
         try:
-            headers = {
-                'Content-Type': 'application/json',
-                'User-Agent': f'ESP8266-{self.device_id}'
-            }
-            
-            response = requests.post(
-                f"{self.api_endpoint}/sensor-data",
-                json=sensor_data,
-                headers=headers,
-                timeout=5
+            response = await self.client.post(
+                self.data_url,
+                content=orjson.dumps(sensor_data),
+                headers=self.headers
             )
             
             if response.status_code == 200:
-                logger.info(f"Device {self.device_id}: Data sent successfully")
+                logger.info("Device %s: Data sent successfully", self.device_id)
                 return True
             else:
-                logger.error(f"Device {self.device_id}: Failed to send data - Status: {response.status_code}")
+                logger.error("Device %s: Failed to send data - Status: %s", self.device_id, response.status_code)
                 return False
                 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Device {self.device_id}: Network error - {str(e)}")
+        except httpx.HTTPError as e:
+            logger.error("Device %s: Network error - %s", self.device_id, e)
+            return False
+
+    async def send_sensor_batch(self, batch):
+        """Send all of this device's readings in one request; None when the backend lacks the endpoint"""
+        if not self.is_connected:
+            logger.warning("Device %s: Not connected to WiFi", self.device_id)
+            return False
+            
+        try:
+            response = await self.client.post(
+                self.batch_url,
+                content=gzip.compress(
+                    orjson.dumps({"device_id": self.device_id, "readings": batch}), compresslevel=GZIP_LEVEL
+                ),
+                headers=self.batch_headers
+            )
+            
+            if response.status_code in (404, 405):
+                logger.warning("Device %s: Batch endpoint unavailable, sending per sensor", self.device_id)
+                self.batch_supported = False
+                return None
+            if response.status_code == 200:
+                logger.info("Device %s: Sent %s readings", self.device_id, len(batch))
+                return True
+            logger.error("Device %s: Failed to send batch - Status: %s", self.device_id, response.status_code)
+            return False
+                
+        except httpx.HTTPError as e:
+            logger.error("Device %s: Network error - %s", self.device_id, e)
             return False
 
 class ParkingSlotSensor:
     """Represents a parking slot with IoT sensor"""
     
+    __slots__ = (
+        'slot_id', 'lot_id', 'device_id', 'sensor_index', 'sensor',
+        'last_status', 'status_change_time', '_payload',
+    )
+    
     def __init__(self, slot_id, lot_id, device_id, sensor_index):
         self.slot_id = slot_id
         self.lot_id = lot_id
@@ -105,27 +161,39 @@ class ParkingSlotSensor:
         self.sensor = UltrasonicSensor(trigger_pin=2, echo_pin=3)
         self.last_status = "free"
         self.status_change_time = datetime.now()
+        # Reused by every read: a reading is POSTed within its tick, before the next read
+        self._payload = {
+            "slot_id": slot_id,
+            "lot_id": lot_id,
+            "distance": 0.0,
+            "ts_ns": 0,
+            "status": "free",
+            "device_id": device_id,
+            "sensor_index": sensor_index
+        }
         
     def read_status(self):
         """Read current slot status"""
-        is_occupied = self.sensor.is_occupied()
-        current_status = "occupied" if is_occupied else "free"
+        # One measurement decides the status and is the distance reported with it
+        return self.read_status_with(self.sensor.measure_distance())
+        
+    def read_status_with(self, distance, occupied=None):
+        """Build the status reading for an already measured distance (cm)"""
+        if occupied is None:
+            occupied = distance < self.sensor.distance_threshold
+        current_status = "occupied" if occupied else "free"
         
         # Detect status change
         if current_status != self.last_status:
             self.status_change_time = datetime.now()
             self.last_status = current_status
-            logger.info(f"Slot {self.slot_id}: Status changed to {current_status}")
+            logger.info("Slot %s: Status changed to %s", self.slot_id, current_status)
             
-        return {
-            "slot_id": self.slot_id,
-            "lot_id": self.lot_id,
-            "distance": self.sensor.measure_distance(),
-            "timestamp": datetime.now().isoformat(),
-            "status": current_status,
-            "device_id": self.device_id,
-            "sensor_index": self.sensor_index
-        }
+        payload = self._payload
+        payload["distance"] = distance
+        payload["ts_ns"] = time.time_ns()  # the backend turns it into the reading's timestamp
+        payload["status"] = current_status
+        return payload
 
 class IoTDeviceManager:
     """Manages multiple IoT devices and sensors"""
@@ -135,6 +203,15 @@ class IoTDeviceManager:
         self.devices = {}
         self.slots = {}
         self.running = False
+        self._tick_rng = np.random.default_rng()
+        
+    def _measure_tick(self, thresholds, out_dist, out_occ):
+        """One simulated ultrasonic distance and occupancy per sensor, drawn as a single batch"""
+        n = thresholds.size
+        base = self._tick_rng.uniform(5, 200, n)
+        noise = self._tick_rng.uniform(-2, 2, n)
+        compute_tick(base, noise, thresholds, out_dist, out_occ)
+        return out_dist.tolist(), out_occ.tolist()
         
     def create_device(self, device_id, lot_id, slot_count, wifi_ssid="SmartPark_WiFi", wifi_password="parking123"):
         """Create a new IoT device with sensors"""
@@ -167,9 +244,10 @@ class IoTDeviceManager:
         """Start monitoring all devices and sensors for a limited time"""
         self.running = True
         logger.info(f"Starting IoT device monitoring for {duration} seconds...")
+        warm_up()  # JIT compile here, not in the first tick
         
-        # Start monitoring thread
-        monitor_thread = threading.Thread(target=self._monitor_loop, args=(interval, duration))
+        # Start monitoring thread (it runs the asyncio loop that does all the I/O)
+        monitor_thread = threading.Thread(target=asyncio.run, args=(self._monitor_loop(interval, duration),))
         monitor_thread.daemon = True
         monitor_thread.start()
         
@@ -177,31 +255,83 @@ class IoTDeviceManager:
         
     def stop_monitoring(self):
         """Stop monitoring"""
-        self.running = False
+        self.running = False  # the loop exits at its next check and closes the HTTP client
         logger.info("Stopped IoT device monitoring")
         
-    def _monitor_loop(self, interval, duration):
+    @staticmethod
+    async def _send_device_batch(device, readings):
+        """Send a device's readings in one request, per sensor if unsupported"""
+        success = await device.send_sensor_batch(readings)
+        if success is None:  # old backend: this tick's readings still go out, concurrently
+            success = all(await asyncio.gather(*(device.send_sensor_data(r) for r in readings)))
+        return success
+        
+    async def _monitor_loop(self, interval, duration):
         """Main monitoring loop with timeout"""
         start_time = time.time()
+        devices = [device for device in self.devices.values() if device.is_connected]
+        sensors = [sensor for device in devices for sensor in device.sensors]
+        spans = []  # (device, start, end) of each device's slice of a tick's readings
+        start = 0
+        for device in devices:
+            spans.append((device, start, start + len(device.sensors)))
+            start += len(device.sensors)
+        thresholds = np.array([sensor.sensor.distance_threshold for sensor in sensors], dtype=np.float64)
+        out_dist = np.empty(len(sensors))
+        out_occ = np.empty(len(sensors), dtype=np.bool_)
+        readers = tuple(sensor.read_status_with for sensor in sensors)
+        measure_tick = self._measure_tick
+        last_sent = [None] * len(sensors)  # occupancy the backend last accepted, per sensor
+        tick = 0
+        transport = httpx.AsyncHTTPTransport(retries=HTTP_RETRIES, limits=HTTP_LIMITS)
         
-        while self.running and (time.time() - start_time) < duration:
-            try:
-                for device_id, device in self.devices.items():
-                    if device.is_connected:
-                        for sensor in device.sensors:
-                            sensor_data = sensor.read_status()
-                            
-                            # Send data to backend
-                            success = device.send_sensor_data(sensor_data)
-                            
-                            if not success:
-                                logger.warning(f"Failed to send data for sensor {sensor.slot_id}")
-                                
-                time.sleep(interval)
-                
-            except Exception as e:
-                logger.error(f"Error in monitoring loop: {str(e)}")
-                time.sleep(interval)
+        async with httpx.AsyncClient(transport=transport, timeout=HTTP_TIMEOUT) as client:
+            for device in devices:
+                device.client = client
+            while self.running and (time.time() - start_time) < duration:
+                try:
+                    # One RNG batch measures every sensor of the tick
+                    distances, occupied = measure_tick(thresholds, out_dist, out_occ)
+                    readings = [read(d, occ) for read, d, occ in zip(readers, distances, occupied)]
+                    
+                    # Only slots whose status changed go out, except every HEARTBEAT_EVERY ticks
+                    resend_all = tick % HEARTBEAT_EVERY == 0
+                    tick += 1
+                    batched, pairs = [], []
+                    for device, start, end in spans:
+                        due = [
+                            i for i in range(start, end)
+                            if resend_all or occupied[i] != last_sent[i]
+                        ]
+                        if not due:
+                            continue
+                        if device.batch_supported:
+                            batched.append((device, due))
+                        else:
+                            pairs.extend((device, i) for i in due)
+                    
+                    # Every POST of a tick is in flight at once on the shared pool
+                    results = await asyncio.gather(
+                        *(self._send_device_batch(device, [readings[i] for i in due]) for device, due in batched),
+                        *(device.send_sensor_data(readings[i]) for device, i in pairs),
+                    )
+                    for (device, due), success in zip(batched, results):
+                        if success:
+                            for i in due:
+                                last_sent[i] = occupied[i]
+                        else:
+                            logger.warning("Failed to send data for device %s", device.device_id)
+                    for (device, i), success in zip(pairs, results[len(batched):]):
+                        if success:
+                            last_sent[i] = occupied[i]
+                        else:
+                            logger.warning("Failed to send data for sensor %s", readings[i]['slot_id'])
+                                    
+                    await asyncio.sleep(interval)
+                    
+                except Exception as e:
+                    logger.error(f"Error in monitoring loop: {str(e)}")
+                    await asyncio.sleep(interval)
         
         # Auto-stop after duration
         if self.running:
@@ -1,26 +1,60 @@
-# backend/auth.py  
+# smart/backend/auth.py
+# Auth for the standalone smart/backend app only. The main app mounts backend/auth/router.py;
+# nothing here runs unless smart/backend/main.py imports it (no client is built at import).
 from fastapi import APIRouter, Depends, HTTPException, status
-from pydantic import BaseModel, EmailStr
-from passlib.context import CryptContext
+from pydantic import BaseModel, EmailStr, constr
+import bcrypt
 import jwt
-from datetime import datetime, timedelta
+import os
+import asyncio
+import hashlib
+import secrets
+import time
+import uuid
+from cachetools import TTLCache
+from dotenv import load_dotenv
+from datetime import datetime, timedelta, timezone
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import DuplicateKeyError
 
 # Config / secrets – adapt accordingly
-SECRET_KEY = "YOUR_SECRET_KEY"  # put in env!
+load_dotenv()
+SECRET_KEY = os.getenv("SECRET_KEY")
+if not SECRET_KEY:
+    # Every worker (and every restart) would sign with a different key, so only development may go without
+    if os.getenv("ENVIRONMENT", "development") != "development":
+        raise RuntimeError("SECRET_KEY must be set when ENVIRONMENT is not 'development'")
+    SECRET_KEY = secrets.token_urlsafe(32)  # random per process, development only
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt cost 10: p95 verify well under 100 ms; older cost-12 hashes are rehashed on login
+BCRYPT_ROUNDS = 10
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
+
+# Only fetch what each path actually reads
+LOGIN_FIELDS = {"_id": 1, "email": 1, "hashed_password": 1}
+CURRENT_USER_FIELDS = {"_id": 1, "email": 1, "role": 1}
+
+# Validated token cache: blake2b(token) -> (user_doc, expiry epoch)
+TOKEN_CACHE_TTL = 300
+token_cache = TTLCache(maxsize=50_000, ttl=TOKEN_CACHE_TTL)
+
+def _token_key(token: str) -> bytes:
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 # Pydantic schemas
 class UserIn(BaseModel):
     email: EmailStr
-    password: str
+    # Bounded so oversized inputs are rejected before any bcrypt work
+    password: constr(min_length=8, max_length=128)
+
+class LoginIn(BaseModel):
+    email: EmailStr
+    password: constr(max_length=128)  # no minimum: older accounts may have shorter passwords
 
 class UserOut(BaseModel):
     id: str
@@ -30,26 +64,47 @@ class Token(BaseModel):
     access_token: str
     token_type: str
 
-# MongoDB setup (example)
-client = AsyncIOMotorClient("mongodb://localhost:27017")
-db = client.smart_parking
-users_col = db.users
+# MongoDB setup – bound by main.py so auth shares the app's pooled client
+users_col = None
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+def bind_database(db):
+    global users_col
+    users_col = db.users
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+# bcrypt is the only scheme stored, so call it directly (72-byte input limit)
+def _hash_password(password):
+    return bcrypt.hashpw(password.encode()[:72], bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode()
+
+def _verify_and_update(plain_password, hashed_password):
+    try:
+        if not bcrypt.checkpw(plain_password.encode()[:72], hashed_password.encode()):
+            return False, None
+        rounds = int(hashed_password.split("$")[2])  # $2b$<rounds>$...
+    except (ValueError, IndexError):
+        return False, None
+    return True, _hash_password(plain_password) if rounds > BCRYPT_ROUNDS else None
+
+# bcrypt is CPU-bound; keep it off the event loop
+async def verify_password(plain_password, hashed_password):
+    valid, _ = await asyncio.to_thread(_verify_and_update, plain_password, hashed_password)
+    return valid
+
+async def get_password_hash(password):
+    return await asyncio.to_thread(_hash_password, password)
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})
+    lifetime = int(expires_delta.total_seconds()) if expires_delta else ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    to_encode["exp"] = int(time.time()) + lifetime  # RFC 7519 NumericDate
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     token = credentials.credentials
+    key = _token_key(token)
+    cached = token_cache.get(key)
+    if cached is not None and cached[1] > time.time():
+        return cached[0]
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("user_id")
@@ -57,33 +112,41 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid auth token")
     except jwt.PyJWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid auth token")
-    user = await users_col.find_one({"_id": user_id})
+    user = await users_col.find_one({"_id": user_id}, projection=CURRENT_USER_FIELDS)
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    token_cache[key] = (user, min(payload["exp"], time.time() + TOKEN_CACHE_TTL))
     return user
 
 @router.post("/register", response_model=UserOut)
 async def register(user_in: UserIn):
-    existing = await users_col.find_one({"email": user_in.email})
-    if existing:
+    hashed_pw = await get_password_hash(user_in.password)
+    # String _id matches the JWT user_id claim, so get_current_user can look it up directly
+    user_doc = {"_id": str(uuid.uuid4()), "email": user_in.email, "hashed_password": hashed_pw, "created_at": datetime.now(timezone.utc)}
+    # Unique index on email makes the insert itself the duplicate check
+    try:
+        res = await users_col.insert_one(user_doc)
+    except DuplicateKeyError:
         raise HTTPException(status_code=400, detail="Email already registered")
-    hashed_pw = get_password_hash(user_in.password)
-    user_doc = {"email": user_in.email, "hashed_password": hashed_pw, "created_at": datetime.utcnow()}
-    res = await users_col.insert_one(user_doc)
-    return UserOut(id=str(res.inserted_id), email=user_in.email)
+    return UserOut(id=res.inserted_id, email=user_in.email)
 
 @router.post("/login", response_model=Token)
-async def login(user_in: UserIn):
-    user = await users_col.find_one({"email": user_in.email})
+async def login(user_in: LoginIn):
+    user = await users_col.find_one({"email": user_in.email}, projection=LOGIN_FIELDS)
     if not user:
         raise HTTPException(status_code=400, detail="Incorrect email or password")
-    if not verify_password(user_in.password, user["hashed_password"]):
+    valid, new_hash = await asyncio.to_thread(_verify_and_update, user_in.password, user["hashed_password"])
+    if not valid:
         raise HTTPException(status_code=400, detail="Incorrect email or password")
+    if new_hash:
+        await users_col.update_one({"_id": user["_id"]}, {"$set": {"hashed_password": new_hash}})
     access_token = create_access_token(data={"user_id": str(user["_id"]), "email": user["email"]})
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/logout")
-async def logout():
+async def logout(credentials: HTTPAuthorizationCredentials | None = Depends(optional_security)):
+    if credentials:
+        token_cache.pop(_token_key(credentials.credentials), None)
     # If stateless JWT you cannot really “invalidate” easily unless you maintain blacklist.
     # Simplest: frontend just deletes token, you can optionally maintain a blacklist.
     return {"msg": "Logged out"}
@@ -1,18 +1,65 @@
 import asyncio
+import itertools
 import motor.motor_asyncio
-from pymongo import GEOSPHERE
-from datetime import datetime, timedelta
+from pymongo import GEOSPHERE, UpdateOne
+from datetime import datetime, timezone
 import logging
+import os
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+SENSOR_INSERT_BATCH = 1000
+MONGO_CLIENT_OPTIONS = {
+    "maxPoolSize": 200,
+    "minPoolSize": 20,
+    "maxIdleTimeMS": 30000,
+    "compressors": "zstd,zlib",  # negotiated with the server; zstd needs the zstandard package
+    "w": 1,
+    "retryWrites": True,
+    "serverSelectionTimeoutMS": 3000,
+}
+RETENTION_SECONDS = 30 * 86400  # TTL for sensor data, optimization logs and heartbeats
+
+# Stored lot location is {"lat", "lng"} plus top-level loc_lat/loc_lng. GeoJSON points are
+# converted; location is unset first because $set with an embedded document merges into it.
+LOT_LOCATION_MIGRATIONS = (
+    (
+        {"location.coordinates": {"$exists": True}},
+        [
+            {"$set": {
+                "loc_lat": {"$arrayElemAt": ["$location.coordinates", 1]},
+                "loc_lng": {"$arrayElemAt": ["$location.coordinates", 0]},
+            }},
+            {"$unset": "location"},
+            {"$set": {"location": {"lat": "$loc_lat", "lng": "$loc_lng"}}},
+        ],
+    ),
+    (
+        {"loc_lat": {"$exists": False}, "location.lat": {"$exists": True}},
+        [{"$set": {"loc_lat": "$location.lat", "loc_lng": "$location.lng"}}],
+    ),
+)
+
+
+async def bulk_insert(collection, docs, batch=SENSOR_INSERT_BATCH, concurrency=2):
+    """insert_many in chunks under the 16 MB BSON message limit, a few chunks in flight at once"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def insert_chunk(chunk):
+        async with semaphore:
+            await collection.insert_many(chunk, ordered=False)
+
+    await asyncio.gather(*(insert_chunk(docs[i:i + batch]) for i in range(0, len(docs), batch)))
+
+
 class DatabaseManager:
     """MongoDB database manager for Smart Parking System"""
 
-    def __init__(self, mongodb_url="mongodb://localhost:27017", database_name="smart_parking"):
-        self.mongodb_url = mongodb_url
+    def __init__(self, mongodb_url=None, database_name="smart_parking"):
+        # Read at construction, so an app that calls load_dotenv() after importing this still applies
+        self.mongodb_url = mongodb_url or os.getenv("MONGODB_URL", "mongodb://localhost:27017")
         self.database_name = database_name
         self.client = None
         self.db = None
@@ -20,21 +67,19 @@ class DatabaseManager:
     async def connect(self):
         """Connect to MongoDB"""
         try:
-            self.client = motor.motor_asyncio.AsyncIOMotorClient(self.mongodb_url)
+            self.client = motor.motor_asyncio.AsyncIOMotorClient(self.mongodb_url, **MONGO_CLIENT_OPTIONS)
             self.db = self.client[self.database_name]
 
             # Test connection
             await self.client.admin.command("ping")
-            logger.info(f"✅ Connected to MongoDB: {self.database_name}")
-
-            # Drop conflicting collections before index creation
-            await self.safe_reset_collections()
+            logger.info("Connected to MongoDB: %s", self.database_name)
 
             # Create indexes
             await self.create_indexes()
+            await self.migrate_lot_locations()
 
         except Exception as e:
-            logger.error(f"❌ Failed to connect to MongoDB: {str(e)}")
+            logger.error("Failed to connect to MongoDB: %s", e)
             raise
 
     async def disconnect(self):
@@ -43,76 +88,102 @@ class DatabaseManager:
             self.client.close()
             logger.info("Disconnected from MongoDB")
 
-    async def safe_reset_collections(self):
-        """Drops problematic collections if duplicates exist"""
-        collections_to_reset = ["reservations"]
-        for name in collections_to_reset:
-            try:
-                await self.db.drop_collection(name)
-                logger.info(f"🧹 Dropped old collection: {name}")
-            except Exception as e:
-                logger.warning(f"⚠️ Could not drop collection {name}: {e}")
+    def _sensor_index_tasks(self, sensor_timeseries):
+        """sensor_data index builds: readings keep lot_id/slot_id under meta, as the main backend writes them"""
+        tasks = [
+            self.db.sensor_data.create_index([("meta.lot_id", 1), ("timestamp", -1)]),
+            self.db.sensor_data.create_index([("meta.slot_id", 1), ("timestamp", -1)]),
+        ]
+        if not sensor_timeseries:
+            # Regular collection: older readings have top-level ids and expiry needs a TTL index
+            # (time series collections expire on their own and reject one on the time field)
+            tasks += [
+                self.db.sensor_data.create_index([("lot_id", 1), ("timestamp", -1)]),
+                self.db.sensor_data.create_index([("slot_id", 1), ("timestamp", -1)]),
+                self.db.sensor_data.create_index("timestamp", name="timestamp_ttl", expireAfterSeconds=RETENTION_SECONDS),
+            ]
+        return tasks
 
     async def create_indexes(self):
         """Create database indexes for better performance"""
         try:
-            # Drop all old indexes
-            for collection_name in [
-                "parking_lots",
-                "reservations",
-                "sensor_data",
-                "optimization_logs",
-                "device_heartbeats",
-            ]:
-                try:
-                    await self.db[collection_name].drop_indexes()
-                except Exception:
-                    pass
-
-            # Parking lots collection
-            await self.db.parking_lots.create_index("lot_id", unique=True)
-            await self.db.parking_lots.create_index([("location", GEOSPHERE)])
-
-            # Reservations collection
-            await self.db.reservations.create_index("reservation_id", unique=True)
-            await self.db.reservations.create_index("user_id")
-            await self.db.reservations.create_index("lot_id")
-            await self.db.reservations.create_index("start_time")
-            await self.db.reservations.create_index("status")
-
-            # Sensor data collection
-            await self.db.sensor_data.create_index("slot_id")
-            await self.db.sensor_data.create_index("lot_id")
-            await self.db.sensor_data.create_index("timestamp")
-            await self.db.sensor_data.create_index([("lot_id", 1), ("timestamp", -1)])
-
-            # Optimization logs collection
-            await self.db.optimization_logs.create_index("timestamp")
-            await self.db.optimization_logs.create_index("status")
-
-            # Device heartbeats collection
-            await self.db.device_heartbeats.create_index("device_id")
-            await self.db.device_heartbeats.create_index("timestamp")
-
-            logger.info("✅ Database indexes created successfully")
+            # The main backend may have created sensor_data as a time series collection
+            sensor_timeseries = bool(await self.db.list_collection_names(
+                filter={"name": "sensor_data", "type": "timeseries"}
+            ))
+
+            # Plain timestamp indexes become TTL indexes below; MongoDB rejects a TTL index over an
+            # existing plain one on the same key, so drop those first (absent on fresh DBs)
+            await asyncio.gather(
+                *(
+                    self.db[name].drop_index("timestamp_1")
+                    for name in ["sensor_data", "optimization_logs", "device_heartbeats"]
+                ),
+                # superseded by the (status, timestamp) index below
+                self.db.optimization_logs.drop_index("status_1"),
+                return_exceptions=True,
+            )
+
+            # Idempotent: existing identical indexes are left as they are
+            await asyncio.gather(
+                # Parking lots collection
+                self.db.parking_lots.create_index("lot_id", unique=True),
+                self.db.parking_lots.create_index([("location", GEOSPHERE)]),
+
+                # Reservations collection
+                self.db.reservations.create_index("reservation_id", unique=True),
+                self.db.reservations.create_index([("user_id", 1), ("start_time", -1)]),
+                self.db.reservations.create_index("lot_id"),
+                self.db.reservations.create_index("status"),
+
+                # Sensor data collection
+                # Compound indexes also cover equality-only lookups on lot_id / slot_id
+                *self._sensor_index_tasks(sensor_timeseries),
+
+                # Users collection
+                # auth.register() relies on this index (DuplicateKeyError) to reject a taken email
+                self.db.users.create_index("email", unique=True),
+                self.db.users.create_index("user_id", unique=True, sparse=True),
+
+                # Optimization logs collection
+                self.db.optimization_logs.create_index("timestamp", name="timestamp_ttl", expireAfterSeconds=RETENTION_SECONDS),
+                self.db.optimization_logs.create_index([("status", 1), ("timestamp", -1)]),
+
+                # Device heartbeats collection
+                self.db.device_heartbeats.create_index("device_id"),
+                self.db.device_heartbeats.create_index("timestamp", name="timestamp_ttl", expireAfterSeconds=RETENTION_SECONDS),
+            )
+
+            logger.info("Database indexes created successfully")
 
         except Exception as e:
-            logger.error(f"❌ Failed to create indexes: {str(e)}")
+            logger.error("Failed to create indexes: %s", e)
+
+    async def migrate_lot_locations(self):
+        """Rewrite lot locations into the stored form the API reads (no-op once migrated)"""
+        try:
+            for query, pipeline in LOT_LOCATION_MIGRATIONS:
+                result = await self.db.parking_lots.update_many(query, pipeline)
+                if result.modified_count:
+                    logger.info("Normalized location on %d parking lots", result.modified_count)
+        except Exception as e:
+            logger.error("Lot location migration failed: %s", e)
 
     async def initialize_sample_data(self):
         """Initialize database with sample data"""
         try:
-            # Clean collections before inserting
-            for collection in ["parking_lots", "sensor_data", "users"]:
-                await self.db[collection].delete_many({})
+            # Sensor readings are regenerated; lots and users are only inserted if missing
+            await self.db.sensor_data.delete_many({})
+
+            # One UTC timestamp shared by every sample document
+            now = datetime.now(timezone.utc)
 
             # Sample parking lots in Bengaluru
             parking_lots = [
                 {
                     "lot_id": "lot_001",
                     "name": "MG Road Parking Complex",
-                    "location": { "lat": 12.9716, "lng": 77.5946 },
-
+                    "location": {"lat": 12.9716, "lng": 77.5946},
                     "address": "MG Road, Bengaluru, Karnataka",
                     "total_slots": 60,
                     "reserved_slots": 10,
@@ -120,14 +191,13 @@ class DatabaseManager:
                     "occupied_slots": 5,
                     "hourly_rate": 40.0,
                     "features": ["covered", "security", "EV charging"],
-                    "created_at": datetime.now(),
-                    "updated_at": datetime.now()
+                    "created_at": now,
+                    "updated_at": now
                 },
                 {
                     "lot_id": "lot_002",
                     "name": "Koramangala 1st Block Parking",
-                    "location": { "lat": 12.9716, "lng": 77.5946 }
-
+                    "location": {"lat": 12.9352, "lng": 77.6245},
                     "address": "Koramangala 1st Block, Bengaluru, Karnataka",
                     "total_slots": 90,
                     "reserved_slots": 20,
@@ -135,14 +205,13 @@ class DatabaseManager:
                     "occupied_slots": 5,
                     "hourly_rate": 30.0,
                     "features": ["open", "security"],
-                    "created_at": datetime.now(),
-                    "updated_at": datetime.now()
+                    "created_at": now,
+                    "updated_at": now
                 },
                 {
                     "lot_id": "lot_003",
                     "name": "Whitefield Forum Value Mall Parking",
-                    "location": { "lat": 12.9716, "lng": 77.5946 }
-
+                    "location": {"lat": 12.9692, "lng": 77.7496},
                     "address": "Forum Value Mall, Whitefield, Bengaluru, Karnataka",
                     "total_slots": 120,
                     "reserved_slots": 30,
@@ -150,14 +219,19 @@ class DatabaseManager:
                     "occupied_slots": 10,
                     "hourly_rate": 35.0,
                     "features": ["covered", "security", "mall access"],
-                    "created_at": datetime.now(),
-                    "updated_at": datetime.now()
+                    "created_at": now,
+                    "updated_at": now
                 },
             ]
+            for lot in parking_lots:  # numeric copies of the location for array reads
+                lot["loc_lat"], lot["loc_lng"] = lot["location"]["lat"], lot["location"]["lng"]
 
-            # Insert or update parking lots
-            for lot in parking_lots:
-                await self.db.parking_lots.replace_one({"lot_id": lot["lot_id"]}, lot, upsert=True)
+            # One bulk_write per collection; $setOnInsert only writes documents that are missing,
+            # so reseeding leaves existing lots and users (and their live counters) untouched
+            await self.db.parking_lots.bulk_write(
+                [UpdateOne({"lot_id": lot["lot_id"]}, {"$setOnInsert": lot}, upsert=True) for lot in parking_lots],
+                ordered=False,
+            )
 
             # Sample users
             users = [
@@ -172,8 +246,8 @@ class DatabaseManager:
                         "preferred_lots": ["lot_001", "lot_002"],
                         "notification_enabled": True,
                     },
-                    "created_at": datetime.now(),
-                    "updated_at": datetime.now(),
+                    "created_at": now,
+                    "updated_at": now,
                 },
                 {
                     "user_id": "admin_001",
@@ -182,56 +256,84 @@ class DatabaseManager:
                     "phone": "+91-9123456780",
                     "role": "admin",
                     "permissions": ["read", "write", "admin"],
-                    "created_at": datetime.now(),
-                    "updated_at": datetime.now(),
+                    "created_at": now,
+                    "updated_at": now,
                 },
             ]
 
-            for user in users:
-                await self.db.users.replace_one({"user_id": user["user_id"]}, user, upsert=True)
-
-            # Simulated sensor data
-            sensor_data = []
-            for lot in parking_lots:
-                for slot_num in range(1, 11):
-                    sensor_data.append({
-                        "slot_id": f"{lot['lot_id']}_slot_{slot_num}",
-                        "lot_id": lot["lot_id"],
-                        "distance": 40.0 + (slot_num * 2.5),
-                        "timestamp": datetime.now(),
-                        "status": "free" if slot_num % 3 != 0 else "occupied",
-                        "device_id": f"device_{lot['lot_id'].split('_')[1]}",
+            await self.db.users.bulk_write(
+                [UpdateOne({"user_id": user["user_id"]}, {"$setOnInsert": user}, upsert=True) for user in users],
+                ordered=False,
+            )
+
+            # Simulated sensor data: 10 slots per lot; device suffix split once per lot
+            lot_devices = [(lot["lot_id"], f"device_{lot['lot_id'].split('_')[1]}") for lot in parking_lots]
+            sensor_data = [
+                {
+                    "meta": {
+                        "lot_id": lot_id,
+                        "slot_id": f"{lot_id}_slot_{slot_num}",
+                        "device_id": device_id,
                         "sensor_index": slot_num - 1,
-                    })
+                    },
+                    "distance": 40.0 + (slot_num * 2.5),
+                    "timestamp": now,
+                    "status": "free" if slot_num % 3 != 0 else "occupied",
+                }
+                for (lot_id, device_id), slot_num in itertools.product(lot_devices, range(1, 11))
+            ]
 
-            if sensor_data:
-                await self.db.sensor_data.insert_many(sensor_data)
+            await bulk_insert(self.db.sensor_data, sensor_data)
 
-            logger.info("✅ Sample data (Bengaluru) initialized successfully")
+            logger.info("Sample data (Bengaluru) initialized successfully")
 
         except Exception as e:
-            logger.error(f"❌ Failed to initialize sample data: {str(e)}")
+            logger.error("Failed to initialize sample data: %s", e)
 
     async def get_collection_stats(self):
-        """Get statistics for all collections"""
-        stats = {}
-        for collection in ["parking_lots", "reservations", "sensor_data", "users"]:
-            try:
-                count = await self.db[collection].count_documents({})
-                stats[collection] = count
-            except Exception as e:
-                stats[collection] = f"Error: {str(e)}"
-        return stats
+        """Get statistics for all collections (metadata estimates, no collection scan)"""
+        collections = ["parking_lots", "reservations", "sensor_data", "users"]
+        # Independent counts, issued concurrently
+        counts = await asyncio.gather(
+            *(self.db[collection].estimated_document_count() for collection in collections),
+            return_exceptions=True,
+        )
+        return {
+            collection: f"Error: {count}" if isinstance(count, Exception) else count
+            for collection, count in zip(collections, counts)
+        }
+
+
+_manager = None
+_connect_lock = asyncio.Lock()
+
+
+async def get_db():
+    """Shared DatabaseManager; connected once, on first use, and reused by later callers."""
+    global _manager
+    if _manager is None:
+        async with _connect_lock:
+            if _manager is None:
+                manager = DatabaseManager()
+                await manager.connect()
+                _manager = manager
+    return _manager
+
+
+async def close_db():
+    """Disconnect the shared manager; the next get_db() connects again."""
+    global _manager
+    if _manager is not None:
+        await _manager.disconnect()
+        _manager = None
 
 
 async def main():
     print("🗄️ Smart Parking Database Initialization")
     print("=" * 50)
 
-    db = DatabaseManager()
-
     try:
-        await db.connect()
+        db = await get_db()
         await db.initialize_sample_data()
         stats = await db.get_collection_stats()
 
@@ -245,7 +347,7 @@ async def main():
         print(f"❌ Database initialization failed: {str(e)}")
 
     finally:
-        await db.disconnect()
+        await close_db()
 
 
 if __name__ == "__main__":
@@ -1,20 +1,31 @@
 from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, Field, model_validator
+from typing import Optional, Dict, Any, Set
 import asyncio
-import json
-from datetime import datetime, timedelta
+import contextlib
+import itertools
+from collections import deque
+import orjson
+import time
+from datetime import datetime, timedelta, timezone
 import numpy as np
-from sklearn.mixture import GaussianMixture
-from motor.motor_asyncio import AsyncIOMotorClient
+from math import asin, cos, radians, sin, sqrt
+from pymongo import ReturnDocument
 import os
 from dotenv import load_dotenv
 import logging
 import requests
 from crpark_manager import CRParkManager
 from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, Request
-from auth import router as auth_router
+from auth import router as auth_router, bind_database as bind_auth_database
+from database_init import close_db, get_db
+
+try:
+    from numba import vectorize
+except ImportError:  # optional: haversine_vec falls back to NumPy ufuncs
+    vectorize = None
 
 
 # -----------------------------
@@ -23,7 +34,6 @@ from auth import router as auth_router
 load_dotenv()
 
 GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
-MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
 
 # Logging
 logging.basicConfig(level=logging.INFO)
@@ -35,7 +45,10 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="Smart Parking System API",
     description="CRPark-Inspired Smart Parking with Bengaluru Locations (MongoDB + INR)",
-    version="2.0.0"
+    version="2.0.0",
+    # jsonable_encoder still runs before ORJSONResponse.render and rejects numpy scalars,
+    # so routes convert with .tolist() / float() / int() before returning
+    default_response_class=ORJSONResponse,
 )
 app.include_router(auth_router)
 crpark = CRParkManager()
@@ -50,9 +63,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# MongoDB
-client = AsyncIOMotorClient(MONGODB_URL)
-db = client.smart_parking
+# MongoDB: the database_init manager's handle (MONGODB_URL), bound at startup
+db = None
 
 
 # -----------------------------
@@ -82,120 +94,186 @@ class SensorData(BaseModel):
     slot_id: str
     lot_id: str
     distance: float
-    timestamp: datetime
+    timestamp: Optional[datetime] = None
+    ts_ns: Optional[int] = Field(default=None, exclude=True)  # epoch ns; the IoT simulators send this instead
     status: str
 
+    @model_validator(mode="after")
+    def _timestamp_from_ns(self):
+        if self.timestamp is None:
+            if self.ts_ns is None:
+                raise ValueError("timestamp or ts_ns is required")
+            self.timestamp = _EPOCH + timedelta(microseconds=self.ts_ns // 1000)
+        return self
+
 
 # -----------------------------
 # 🔌 WEBSOCKET MANAGER
 # -----------------------------
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "100"))  # messages a client may fall behind by before it is dropped
+
+
 class ConnectionManager:
+    """Per-client bounded send queues drained by one task each; broadcast never waits on a socket."""
+
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
+        self.active_connections: Set[WebSocket] = set()
+        self._queues: Dict[WebSocket, asyncio.Queue] = {}
+        self._senders: Dict[WebSocket, asyncio.Task] = {}
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        self.active_connections.add(websocket)
+        queue = asyncio.Queue(maxsize=WS_SEND_QUEUE_SIZE)
+        self._queues[websocket] = queue
+        self._senders[websocket] = asyncio.create_task(self._sender(websocket, queue))
 
     def disconnect(self, websocket: WebSocket):
         if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-
-    async def broadcast(self, message: str):
-        for connection in self.active_connections:
+            self.active_connections.discard(websocket)
+        self._queues.pop(websocket, None)
+        sender = self._senders.pop(websocket, None)
+        if sender is not None and sender is not asyncio.current_task():
+            sender.cancel()
+
+    async def _sender(self, websocket: WebSocket, queue: asyncio.Queue):
+        try:
+            while True:
+                await websocket.send(await queue.get())
+        except asyncio.CancelledError:
+            with contextlib.suppress(Exception):  # dropped while open: close it
+                await websocket.close(code=1013)
+            raise
+        except Exception:
+            self.disconnect(websocket)
+
+    async def broadcast(self, message: str | bytes):
+        if isinstance(message, bytes):
+            message = message.decode("utf-8")  # once; clients JSON.parse text frames
+        frame = {"type": "websocket.send", "text": message}  # one ASGI message for every queue
+        behind = []  # dropped after the loop: disconnect() mutates _queues
+        for connection, queue in self._queues.items():
             try:
-                await connection.send_text(message)
-            except:
-                pass
+                queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                behind.append(connection)
+        for connection in behind:
+            logger.warning("Dropping a WebSocket client that fell too far behind")
+            self.disconnect(connection)
 
 
 manager = ConnectionManager()
 
+# Naive datetimes here are UTC
+WS_JSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z
+
 
 # -----------------------------
 # 🧮 COST CALCULATION LOGIC
 # -----------------------------
-def haversine_distance(lat1, lon1, lat2, lon2):
-    R = 6371
+# Keep-alive pool so repeated Distance Matrix calls skip the TCP/TLS handshake
+_http_session = requests.Session()
+
+
+if vectorize is not None:
+    # One fused native loop instead of a temporary array per step; no fastmath,
+    # so the operations are the NumPy fallback's, without reassociation.
+    @vectorize(["float64(float64, float64, float64, float64, float64)"], cache=True)
+    def _haversine_fused(lat1r, lng1r, cos_lat1, lat2, lng2):
+        lat2r = radians(lat2)
+        a = sin((lat2r - lat1r) / 2) ** 2 + cos_lat1 * cos(lat2r) * sin((radians(lng2) - lng1r) / 2) ** 2
+        return 6371 * (2 * asin(sqrt(a)))
+else:
+    _haversine_fused = None
+
+
+def haversine_vec(lat1, lng1, lat2, lng2):
+    """Haversine distance (km) from one point to arrays of points, one ufunc pass per step."""
+    if _haversine_fused is not None:
+        lat1r = radians(lat1)
+        return _haversine_fused(lat1r, radians(lng1), cos(lat1r), lat2, lng2)
     dlat = np.radians(lat2 - lat1)
-    dlng = np.radians(lon2 - lon1)
-    a = np.sin(dlat/2)**2 + np.cos(np.radians(lat1))*np.cos(np.radians(lat2))*np.sin(dlng/2)**2
-    c = 2*np.arcsin(np.sqrt(a))
-    return R * c
+    dlng = np.radians(lng2 - lng1)
+    a = np.sin(dlat/2)**2 + cos(radians(lat1))*np.cos(np.radians(lat2))*np.sin(dlng/2)**2
+    return 6371 * (2*np.arcsin(np.sqrt(a)))
 
 
-def calculate_driving_time(current, lot):
+def driving_times_batch(current, lat, lng):
+    """One Distance Matrix call for every lot; minutes per lot (NaN where Google had no route), or None."""
     try:
-        if GOOGLE_MAPS_API_KEY:
-            url = "https://maps.googleapis.com/maps/api/distancematrix/json"
-            params = {
-                "origins": f"{current['lat']},{current['lng']}",
-                "destinations": f"{lot['lat']},{lot['lng']}",
-                "mode": "driving",
-                "key": GOOGLE_MAPS_API_KEY
-            }
-            resp = requests.get(url, params=params)
-            data = resp.json()
-            if data.get("status") == "OK":
-                element = data["rows"][0]["elements"][0]
-                if element.get("status") == "OK":
-                    return element["duration"]["value"] / 60
+        params = {
+            "origins": f"{current['lat']},{current['lng']}",
+            "destinations": "|".join(f"{a},{b}" for a, b in zip(lat.tolist(), lng.tolist())),
+            "mode": "driving",
+            "key": GOOGLE_MAPS_API_KEY
+        }
+        resp = _http_session.get("https://maps.googleapis.com/maps/api/distancematrix/json", params=params, timeout=5)
+        data = resp.json()
+        if data.get("status") != "OK":
+            return None
+        return np.array([
+            element["duration"]["value"] / 60 if element.get("status") == "OK" else np.nan
+            for element in data["rows"][0]["elements"]
+        ])
     except Exception as e:
         logger.warning(f"Google Maps API failed: {e}")
-
-    distance = haversine_distance(current["lat"], current["lng"], lot["lat"], lot["lng"])
-    return float(np.clip(distance / 30 * 60, 10, 20))  # in minutes
-
-
-def calculate_walking_time(lot, destination):
-    distance = haversine_distance(lot["lat"], lot["lng"], destination["lat"], destination["lng"])
-    return float(min(distance / 5 * 60, 10))  # minutes
-
-
-def calculate_expected_waiting_time(utilization):
-    base_wait = 3 + utilization * 5
-    return float(np.clip(base_wait, 2, 8))
-
-
-def calculate_parking_cost(request: ParkingRequest, lot: dict) -> Dict[str, float]:
-    """Returns detailed cost breakdown (INR)"""
-    driving_time = calculate_driving_time(request.current_location, lot["location"])
-    walking_time = calculate_walking_time(lot["location"], request.destination)
-    utilization = (lot["occupied_slots"] + lot["reserved_slots"]) / lot["total_slots"]
-    waiting_time = calculate_expected_waiting_time(utilization)
-
-    base_parking = lot.get("hourly_rate", 40.0)
-    driving_cost = driving_time * 2.0
-    walking_cost = walking_time * 0.5
-    waiting_cost = waiting_time * 3.0
-    reservation_cost = base_parking + driving_cost + walking_cost
-    competition_cost = reservation_cost + waiting_cost
-    pa_i = lot.get("pa_i", 0.7)
-    total_cost = pa_i * reservation_cost + (1 - pa_i) * competition_cost
-    total_cost = min(total_cost, 200.0)
-
-    return {
-        "total_cost": round(total_cost, 2),
-        "driving_time": round(driving_time, 2),
-        "walking_time": round(walking_time, 2),
-        "waiting_time": round(waiting_time, 2),
-        "reservation_cost": round(reservation_cost, 2),
-        "competition_cost": round(competition_cost, 2),
-        "success_probability": pa_i
+        return None
+
+
+async def calculate_parking_costs(request: ParkingRequest, lots: list):
+    """(cheapest lot document, {lot_id: cost breakdown (INR)}) computed as array arithmetic."""
+    current, destination = request.current_location, request.destination
+    lat = np.fromiter((l["location"]["lat"] for l in lots), dtype=np.float64, count=len(lots))
+    lng = np.fromiter((l["location"]["lng"] for l in lots), dtype=np.float64, count=len(lots))
+    occ = np.fromiter((l["occupied_slots"] for l in lots), dtype=np.float64, count=len(lots))
+    res = np.fromiter((l["reserved_slots"] for l in lots), dtype=np.float64, count=len(lots))
+    tot = np.fromiter((l["total_slots"] for l in lots), dtype=np.float64, count=len(lots))
+    rate = np.fromiter((l.get("hourly_rate", 40.0) for l in lots), dtype=np.float64, count=len(lots))
+    pa = np.fromiter((l.get("pa_i", 0.7) for l in lots), dtype=np.float64, count=len(lots))
+
+    driving_time = np.clip(haversine_vec(current["lat"], current["lng"], lat, lng) / 30 * 60, 10.0, 20.0)
+    if GOOGLE_MAPS_API_KEY:
+        # Blocking requests call, so it runs off the event loop
+        google_times = await asyncio.to_thread(driving_times_batch, current, lat, lng)
+        if google_times is not None:
+            driving_time = np.where(np.isnan(google_times), driving_time, google_times)
+    walking_time = np.minimum(haversine_vec(destination["lat"], destination["lng"], lat, lng) / 5 * 60, 10.0)
+    waiting_time = np.clip(3 + (occ + res) / tot * 5, 2.0, 8.0)
+    reservation_cost = rate + driving_time * 2.0 + walking_time * 0.5
+    competition_cost = reservation_cost + waiting_time * 3.0
+    total_cost = np.minimum(pa * reservation_cost + (1 - pa) * competition_cost, 200.0)
+
+    optimal_lot = lots[int(np.argmin(total_cost))]
+    columns = [c.tolist() for c in (
+        total_cost, driving_time, walking_time, waiting_time, reservation_cost, competition_cost
+    )]
+    costs = {
+        l["lot_id"]: {
+            "total_cost": round(tc, 2),
+            "driving_time": round(dt, 2),
+            "walking_time": round(wt, 2),
+            "waiting_time": round(wa, 2),
+            "reservation_cost": round(rc, 2),
+            "competition_cost": round(cc, 2),
+            "success_probability": l.get("pa_i", 0.7)
+        }
+        for l, tc, dt, wt, wa, rc, cc in zip(lots, *columns)
     }
+    return optimal_lot, costs
 
 
 # -----------------------------
 # 🧠 GMM MODEL
 # -----------------------------
-gmm_model: Optional[GaussianMixture] = None
+gmm_model = None  # sklearn GaussianMixture once trained
 
 
 def train_gmm_model():
     global gmm_model
-    np.random.seed(42)
-    hours = np.random.randint(0, 24, 1000)
-    days = np.random.randint(0, 7, 1000)
+    from sklearn.mixture import GaussianMixture  # deferred: sklearn import is slow
+    rng = np.random.default_rng(42)  # local generator; NumPy's global state is left alone
+    hours = rng.integers(0, 24, 1000)
+    days = rng.integers(0, 7, 1000)
     features = np.column_stack([hours, days])
     gmm_model = GaussianMixture(n_components=3, random_state=42)
     gmm_model.fit(features)
@@ -205,12 +283,52 @@ def train_gmm_model():
 # -----------------------------
 # 🌐 API ROUTES
 # -----------------------------
+SENSOR_FLUSH_SIZE = 100  # flush as soon as this many readings are buffered
+SENSOR_FLUSH_INTERVAL = 0.1  # seconds between background flushes
+
+# sensor_data documents waiting for the next insert_many
+_sensor_buffer: deque = deque()
+
+
+async def flush_sensor_buffer():
+    """Write every buffered reading in one unordered insert_many."""
+    if not _sensor_buffer:
+        return
+    # No await between copy and clear, so nothing appended in between is lost
+    docs = list(_sensor_buffer)
+    _sensor_buffer.clear()
+    try:
+        await db.sensor_data.insert_many(docs, ordered=False)
+    except Exception as e:
+        logger.warning(f"Sensor buffer flush of {len(docs)} readings failed: {e}")
+
+
+async def run_sensor_flusher():
+    while True:
+        await asyncio.sleep(SENSOR_FLUSH_INTERVAL)
+        await flush_sensor_buffer()
+
+
 @app.on_event("startup")
 async def startup_event():
-    train_gmm_model()
+    # No endpoint reads gmm_model (waiting time comes from utilization), so the fit is
+    # not run here; call train_gmm_model() where a demand prediction is actually needed
+    global db
+    # Shared with database_init; connecting also builds the indexes the request paths rely on
+    db = (await get_db()).db
+    bind_auth_database(db)
+    app.state.sensor_flusher = asyncio.create_task(run_sensor_flusher())
     logger.info("🚀 Smart Parking API Initialized (Bengaluru Version)")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    app.state.sensor_flusher.cancel()
+    await asyncio.gather(app.state.sensor_flusher, return_exceptions=True)
+    await flush_sensor_buffer()  # readings received since the last tick
+    await close_db()
+
+
 @app.get("/")
 async def root():
     return {"message": "Smart Parking System API (Bengaluru)", "version": "2.0.0"}
@@ -218,115 +336,122 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "timestamp": datetime.now()}
+    return {"status": "healthy", "timestamp": datetime.now(timezone.utc)}
+
+
+# Fields the lot endpoints read; _id is never returned to clients
+LOT_PROJECTION = {
+    "_id": 0, "lot_id": 1, "name": 1, "address": 1, "location": 1, "features": 1,
+    "total_slots": 1, "occupied_slots": 1, "reserved_slots": 1, "competitive_slots": 1,
+    "hourly_rate": 1, "pa_i": 1, "rs_i": 1,
+}
+LOT_FETCH_LIMIT = 500
+
+
+async def fetch_lots(projection=LOT_PROJECTION) -> list:
+    """All lots in one round trip; location is stored as {"lat", "lng"} (see database_init)."""
+    return await db.parking_lots.find({}, projection).to_list(length=LOT_FETCH_LIMIT)
 
 
 @app.get("/parking-lots")
 async def get_parking_lots():
-    lots_cursor = db.parking_lots.find({})
-    lots = []
-    async for lot in lots_cursor:
-        lot["_id"] = str(lot["_id"])
-        lot["location"] = {
-            "lat": lot["location"]["coordinates"][1],
-            "lng": lot["location"]["coordinates"][0]
-        }
-        lots.append(lot)
+    lots = await fetch_lots()
     return {"count": len(lots), "currency": "INR", "lots": lots}
 
 
 
 @app.post("/predict-cost")
 async def predict_parking_cost(request: ParkingRequest):
-    lots_cursor = db.parking_lots.find({})
-    costs = {}
-    lots_data = []
-    async for lot in lots_cursor:
-        lot["_id"] = str(lot["_id"])
-        lot["location"] = {
-            "lat": lot["location"]["coordinates"][1],
-            "lng": lot["location"]["coordinates"][0]
-        }
-        lots_data.append(lot)
-
-    for lot in lots_data:
-        costs[lot["lot_id"]] = calculate_parking_cost(request, lot)
+    lots_data = await fetch_lots()
 
-    optimal_lot = min(costs.keys(), key=lambda x: costs[x]["total_cost"])
+    best, costs = await calculate_parking_costs(request, lots_data)
+    optimal_lot = best["lot_id"]
     return {
         "optimal_lot": optimal_lot,
         "currency": "INR",
         "costs": costs,
         "recommendation": {
             "lot_id": optimal_lot,
-            "lot_name": next(l["name"] for l in lots_data if l["lot_id"] == optimal_lot),
+            "lot_name": best["name"],
             "estimated_cost": costs[optimal_lot]["total_cost"]
         }
     }
 
-@app.post("/sensor-data")
-async def receive_sensor_data(data: SensorData):
-    """Process IoT sensor data and update the MongoDB lot status"""
-    lot = await db.parking_lots.find_one({"lot_id": data.lot_id})
-    if not lot:
-        raise HTTPException(status_code=404, detail="Parking lot not found")
-
-    # Update slot counts
-    occupied = lot.get("occupied_slots", 0)
-    reserved = lot.get("reserved_slots", 0)
-    total = lot.get("total_slots", 0)
+# Lot counters as aggregation expressions (missing fields count as 0)
+_OCCUPIED = {"$ifNull": ["$occupied_slots", 0]}
+_RESERVED = {"$ifNull": ["$reserved_slots", 0]}
+_TOTAL = {"$ifNull": ["$total_slots", 0]}
 
-    if data.status == "occupied" and occupied < total - reserved:
-        occupied += 1
-    elif data.status == "free" and occupied > 0:
-        occupied -= 1
+# New occupied_slots per reading status, bounds-checked server-side; other statuses keep it
+OCCUPANCY_STEP = {
+    "occupied": {"$cond": [
+        {"$lt": [_OCCUPIED, {"$subtract": [_TOTAL, _RESERVED]}]}, {"$add": [_OCCUPIED, 1]}, _OCCUPIED,
+    ]},
+    "free": {"$cond": [{"$gt": [_OCCUPIED, 0]}, {"$subtract": [_OCCUPIED, 1]}, _OCCUPIED]},
+}
 
-    competitive = max(total - reserved - occupied, 0)
 
-    # Update MongoDB document
-    await db.parking_lots.update_one(
+@app.post("/sensor-data")
+async def receive_sensor_data(data: SensorData):
+    """Process IoT sensor data and update the MongoDB lot status"""
+    # One atomic round trip that returns the updated counts; no match means no such lot
+    lot = await db.parking_lots.find_one_and_update(
         {"lot_id": data.lot_id},
-        {"$set": {
-            "occupied_slots": occupied,
-            "competitive_slots": competitive,
-            "updated_at": datetime.now()
-        }}
+        [
+            {"$set": {
+                "occupied_slots": OCCUPANCY_STEP.get(data.status, _OCCUPIED),
+                "updated_at": datetime.now(timezone.utc),
+            }},
+            {"$set": {"competitive_slots": {"$max": [
+                {"$subtract": [_TOTAL, {"$add": [_RESERVED, _OCCUPIED]}]}, 0,
+            ]}}},
+        ],
+        projection={"_id": 0, "occupied_slots": 1, "competitive_slots": 1},
+        return_document=ReturnDocument.AFTER,
     )
-
-    # Save sensor reading
-    await db.sensor_data.insert_one(data.dict())
+    if not lot:
+        raise HTTPException(status_code=404, detail="Parking lot not found")
+    occupied, competitive = lot["occupied_slots"], lot["competitive_slots"]
+
+    # Save sensor reading with the next batched insert, in the main backend's sensor_data shape
+    _sensor_buffer.append({
+        "meta": {"lot_id": data.lot_id, "slot_id": data.slot_id},
+        "distance": data.distance,
+        "timestamp": data.timestamp,
+        "status": data.status,
+    })
+    if len(_sensor_buffer) >= SENSOR_FLUSH_SIZE:
+        await flush_sensor_buffer()
 
     # Broadcast real-time update
-    await manager.broadcast(json.dumps({
+    await manager.broadcast(orjson.dumps({
         "type": "sensor_update",
         "lot_id": data.lot_id,
         "occupied_slots": occupied,
         "competitive_slots": competitive,
-        "timestamp": data.timestamp.isoformat()
-    }))
+        "timestamp": data.timestamp
+    }, option=WS_JSON_OPTIONS))
 
     return {"status": "success", "message": "Sensor data processed"}
 
+_rng = np.random.default_rng()
+
+
 def simulated_annealing_vns():
     """Mock optimization algorithm that adjusts pa_i and rs_i dynamically."""
-    results = {}
-    lots = db.parking_lots.find({})
-    return_params = {}
     # NOTE: Motor async cursor requires async loop; here we just simulate.
-    # For simplicity, return random updates for now.
-    for lot_id in ["lot_001", "lot_002", "lot_003", "lot_004", "lot_005", "lot_006", "lot_007", "lot_008"]:
-        return_params[lot_id] = {
-            "pa_i": round(np.clip(np.random.uniform(0.6, 0.9), 0, 1), 2),
-            "rs_i": round(np.clip(np.random.uniform(0.1, 0.3), 0, 1), 2)
-        }
-    return return_params
+    # For simplicity, return random updates for now (one batched draw per parameter).
+    lot_ids = ["lot_001", "lot_002", "lot_003", "lot_004", "lot_005", "lot_006", "lot_007", "lot_008"]
+    pa = np.round(_rng.uniform(0.6, 0.9, len(lot_ids)), 2).tolist()
+    rs = np.round(_rng.uniform(0.1, 0.3, len(lot_ids)), 2).tolist()
+    return {lot_id: {"pa_i": p, "rs_i": r} for lot_id, p, r in zip(lot_ids, pa, rs)}
 
 @app.post("/optimize")
 async def trigger_optimization():
     try:
         best_params = simulated_annealing_vns()
         optimization_result = {
-            "timestamp": datetime.now(),
+            "timestamp": datetime.now(timezone.utc),
             "parameters": best_params,
             "status": "completed"
         }
@@ -338,6 +463,18 @@ async def trigger_optimization():
 
 
 
+# Millisecond timestamps collide under concurrent requests; the counter keeps IDs
+# unique within a process and time_ns() keeps them ordered across restarts
+_reservation_counter = itertools.count()
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+def _make_reservation_id() -> tuple[str, datetime]:
+    """(reservation_id, creation time) from a single clock read."""
+    ts_ns = time.time_ns()
+    return f"resv-{ts_ns}-{next(_reservation_counter)}", _EPOCH + timedelta(microseconds=ts_ns // 1000)
+
+
 # -----------------------------
 # 🧠 CRPark Reservation API
 # -----------------------------
@@ -354,11 +491,11 @@ async def reserve_with_crpark(request: Request):
     lot_id = body.get("parking_lot_id")
     first_request = body.get("first_request", True)
 
-    # process using your CRPark manager (synchronous in your code)
-    result = crpark.process_reservation(lot_id, first_request)
+    # CRPark manager is synchronous; keep it off the event loop
+    result = await asyncio.to_thread(crpark.process_reservation, lot_id, first_request)
 
     # build a consistent reservation_id and payload
-    reservation_id = f"resv-{int(datetime.utcnow().timestamp() * 1000)}"
+    reservation_id, created_at = _make_reservation_id()
     payload = {
         "type": "reservation_update",
         "reservation_id": reservation_id,
@@ -367,12 +504,12 @@ async def reserve_with_crpark(request: Request):
         "Pa": result.get("Pa"),
         "slot_type": result.get("slot_type"),
         "Tdl": result.get("Tdl"),
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": created_at
     }
 
     # broadcast to connected websocket clients (safe attempt)
     try:
-        await manager.broadcast(json.dumps(payload))
+        await manager.broadcast(orjson.dumps(payload, option=WS_JSON_OPTIONS))
     except Exception as e:
         logger.warning(f"Broadcast failed: {e}")
 
@@ -393,7 +530,7 @@ async def get_lot_status():
     """
     Return current CRPark lot parameters (Pa, Rs, available slots).
     """
-    return {"lots": crpark.lots}
+    return {"lots": crpark.snapshot()}
 
 
 @app.websocket("/ws")
@@ -403,33 +540,52 @@ async def websocket_endpoint(websocket: WebSocket):
         while True:
             await websocket.receive_text()
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
         logger.info("WebSocket client disconnected")
+    finally:
+        manager.disconnect(websocket)
 
 
 # -----------------------------
 # 🧠 ANALYTICS ENDPOINT
 # -----------------------------
+# Per-lot analytics computed server-side; only the finished, rounded figures come back
+ANALYTICS_PIPELINE = [
+    {"$project": {
+        "_id": 0,
+        "lot_id": 1,
+        "name": 1,
+        "utilization": {"$divide": [
+            {"$add": ["$occupied_slots", "$reserved_slots"]},
+            {"$max": ["$total_slots", 1]},  # a lot without slots reports 0 instead of failing
+        ]},
+        "pa_i": {"$ifNull": ["$pa_i", 0.7]},
+        "rs_i": {"$ifNull": ["$rs_i", 0.2]},
+        "hourly_rate": {"$ifNull": ["$hourly_rate", 40.0]},
+    }},
+    {"$set": {
+        "efficiency": {"$round": [{"$multiply": ["$utilization", "$pa_i"]}, 2]},
+        "utilization": {"$round": ["$utilization", 2]},
+    }},
+]
+
+
 @app.get("/analytics")
 async def get_system_analytics():
-    lots_cursor = db.parking_lots.find({})
-    analytics = {}
-    async for lot in lots_cursor:
-        utilization = (lot["occupied_slots"] + lot["reserved_slots"]) / lot["total_slots"]
-        analytics[lot["lot_id"]] = {
-            "name": lot["name"],
-            "utilization": round(utilization, 2),
-            "efficiency": round(utilization * lot.get("pa_i", 0.7), 2),
-            "pa_i": lot.get("pa_i", 0.7),
-            "rs_i": lot.get("rs_i", 0.2),
-            "hourly_rate": lot.get("hourly_rate", 40.0)
-        }
-    return analytics
+    lots = await db.parking_lots.aggregate(ANALYTICS_PIPELINE).to_list(length=LOT_FETCH_LIMIT)
+    return {lot.pop("lot_id"): lot for lot in lots}
 
 
 # -----------------------------
 # ▶️ RUN LOCALLY
 # -----------------------------
 if __name__ == "__main__":
+    import sys
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # uvloop + httptools ship with uvicorn[standard] (uvloop is not available on Windows)
+    uvicorn.run(
+        app,
+        host="0.0.0.0",
+        port=8000,
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+    )
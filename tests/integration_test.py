@@ -5,8 +5,9 @@ Tests the complete system integration and data flow
 """
 
 import asyncio
-import requests
+import httpx
 import json
+import orjson
 import time
 import logging
 from datetime import datetime, timedelta
@@ -17,12 +18,49 @@ import os
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+JSON_HEADERS = {"Content-Type": "application/json"}
+_TS = "__TS__"  # placeholder swapped for the current time on every send
+
+def _with_timestamp(template):
+    """Body from a pre-serialized template with the placeholder set to now"""
+    return template.replace(b'"' + _TS.encode() + b'"', orjson.dumps(datetime.now()))
+
 class SmartParkingTester:
     """Integration tester for Smart Parking System"""
     
+    # Static request bodies, serialized once; only the timestamp changes per send
+    _PREDICT_TEMPLATE = orjson.dumps({
+        "user_id": "test_user",
+        "current_location": {"lat": 40.7128, "lng": -74.0060},
+        "destination": {"lat": 40.7589, "lng": -73.9851},
+        "arrival_time": _TS,
+        "duration": 120,
+        "parking_lot_id": "lot_001",
+        "first_request": True
+    })
+    _RESERVE_TEMPLATE = orjson.dumps({
+        "user_id": "test_user",
+        "lot_id": "lot_001",
+        "first_request": True,
+        "current_location": {"lat": 40.7128, "lng": -74.0060},
+        "destination": {"lat": 40.7589, "lng": -73.9851},
+        "arrival_time": _TS,
+        "duration": 120
+    })
+    _SENSOR_TEMPLATE = orjson.dumps({
+        "slot_id": "test_slot_001",
+        "lot_id": "lot_001",
+        "distance": 25.4,
+        "timestamp": _TS,
+        "status": "occupied",
+        "device_id": "test_device_001",
+        "sensor_index": 0
+    })
+    
     def __init__(self, base_url="http://localhost:8000"):
         self.base_url = base_url
         self.test_results = []
+        self.aclient = None  # httpx.AsyncClient, open while tests run
         
     def log_test(self, test_name, success, message=""):
         """Log test result"""
@@ -35,10 +73,10 @@ class SmartParkingTester:
             "timestamp": datetime.now()
         })
         
-    def test_api_health(self):
+    async def test_api_health(self):
         """Test API health endpoint"""
         try:
-            response = requests.get(f"{self.base_url}/health", timeout=5)
+            response = await self.aclient.get("/health", timeout=5)
             if response.status_code == 200:
                 data = response.json()
                 self.log_test("API Health Check", True, f"Status: {data.get('status')}")
@@ -50,10 +88,10 @@ class SmartParkingTester:
             self.log_test("API Health Check", False, str(e))
             return False
             
-    def test_parking_lots_endpoint(self):
+    async def test_parking_lots_endpoint(self):
         """Test parking lots endpoint"""
         try:
-            response = requests.get(f"{self.base_url}/parking-lots", timeout=5)
+            response = await self.aclient.get("/parking-lots", timeout=5)
             if response.status_code == 200:
                 lots = response.json()
                 self.log_test("Parking Lots Endpoint", True, f"Retrieved {len(lots)} lots")
@@ -65,23 +103,13 @@ class SmartParkingTester:
             self.log_test("Parking Lots Endpoint", False, str(e))
             return None
             
-    def test_cost_prediction(self):
+    async def test_cost_prediction(self):
         """Test cost prediction endpoint"""
         try:
-            request_data = {
-                "user_id": "test_user",
-                "current_location": {"lat": 40.7128, "lng": -74.0060},
-                "destination": {"lat": 40.7589, "lng": -73.9851},
-                "arrival_time": datetime.now().isoformat(),
-                "duration": 120,
-                "parking_lot_id": "lot_001",   # ✅ Add this line
-                "first_request": True          # ✅ Also add this field
-            }
-
-            
-            response = requests.post(
-                f"{self.base_url}/predict-cost",
-                json=request_data,
+            response = await self.aclient.post(
+                "/predict-cost",
+                content=_with_timestamp(self._PREDICT_TEMPLATE),
+                headers=JSON_HEADERS,
                 timeout=10
             )
             
@@ -103,22 +131,13 @@ class SmartParkingTester:
             self.log_test("Cost Prediction", False, str(e))
             return None
             
-    def test_reservation_flow(self):
+    async def test_reservation_flow(self):
         """Test complete reservation flow"""
         try:
-            request_data = {
-                "user_id": "test_user",
-                "lot_id": "lot_001",
-                "first_request": True,
-                "current_location": {"lat": 40.7128, "lng": -74.0060},
-                "destination": {"lat": 40.7589, "lng": -73.9851},
-                "arrival_time": datetime.now().isoformat(),
-                "duration": 120
-            }
-            
-            response = requests.post(
-                f"{self.base_url}/api/reserve",
-                json=request_data,
+            response = await self.aclient.post(
+                "/api/reserve",
+                content=_with_timestamp(self._RESERVE_TEMPLATE),
+                headers=JSON_HEADERS,
                 timeout=10
             )
             
@@ -140,22 +159,13 @@ class SmartParkingTester:
             self.log_test("Reservation Flow", False, str(e))
             return None
             
-    def test_sensor_data_endpoint(self):
+    async def test_sensor_data_endpoint(self):
         """Test sensor data endpoint"""
         try:
-            sensor_data = {
-                "slot_id": "test_slot_001",
-                "lot_id": "lot_001",
-                "distance": 25.4,
-                "timestamp": datetime.now().isoformat(),
-                "status": "occupied",
-                "device_id": "test_device_001",
-                "sensor_index": 0
-            }
-            
-            response = requests.post(
-                f"{self.base_url}/sensor-data",
-                json=sensor_data,
+            response = await self.aclient.post(
+                "/sensor-data",
+                content=_with_timestamp(self._SENSOR_TEMPLATE),
+                headers=JSON_HEADERS,
                 timeout=5
             )
             
@@ -170,15 +180,15 @@ class SmartParkingTester:
             self.log_test("Sensor Data Endpoint", False, str(e))
             return False
             
-    def test_optimization_endpoint(self):
+    async def test_optimization_endpoint(self):
         """Test optimization endpoint"""
         try:
             logger.info("Testing optimization endpoint...")
             
             # Test the optimization endpoint with minimal required data
             # The new implementation doesn't strictly require location data
-            response = requests.post(
-                f"{self.base_url}/api/optimize",
+            response = await self.aclient.post(
+                "/api/optimize",
                 json={
                     "current_location": {"lat": 40.7128, "lng": -74.0060},  # New York coordinates
                     "destination": {"lat": 40.7128, "lng": -74.0060},  # Same as current for test
@@ -243,10 +253,10 @@ class SmartParkingTester:
             self.log_test("Optimization Endpoint", False, str(e))
             return False
             
-    def test_analytics_endpoint(self):
+    async def test_analytics_endpoint(self):
         """Test analytics endpoint"""
         try:
-            response = requests.get(f"{self.base_url}/analytics", timeout=5)
+            response = await self.aclient.get("/analytics", timeout=5)
             
             if response.status_code == 200:
                 data = response.json()
@@ -300,10 +310,10 @@ class SmartParkingTester:
             self.log_test("WebSocket Connection", False, str(e))
             return False
             
-    def test_frontend_accessibility(self):
+    async def test_frontend_accessibility(self):
         """Test if frontend is accessible"""
         try:
-            response = requests.get("http://localhost:3000", timeout=5)
+            response = await self.aclient.get("http://localhost:3000", timeout=5)
             if response.status_code == 200:
                 self.log_test("Frontend Accessibility", True, "Frontend is accessible")
                 return True
@@ -314,28 +324,38 @@ class SmartParkingTester:
             self.log_test("Frontend Accessibility", False, str(e))
             return False
             
-    def run_comprehensive_test(self):
+    def _client(self):
+        return httpx.AsyncClient(base_url=self.base_url, timeout=10)
+        
+    async def check_backend(self):
+        """Health check on its own short-lived client"""
+        async with self._client() as self.aclient:
+            return await self.test_api_health()
+            
+    async def run_comprehensive_test(self):
         """Run all tests"""
         logger.info("🧪 Starting Smart Parking System Integration Tests")
         logger.info("=" * 60)
         
-        # Test API endpoints
-        self.test_api_health()
-        lots = self.test_parking_lots_endpoint()
-        self.test_cost_prediction()
-        self.test_reservation_flow()
-        self.test_sensor_data_endpoint()
-        self.test_optimization_endpoint()
-        self.test_analytics_endpoint()
+        async with self._client() as self.aclient:
+            # Independent endpoint tests (and the frontend check) overlap their round trips
+            await asyncio.gather(
+                self.test_api_health(),
+                self.test_parking_lots_endpoint(),
+                self.test_cost_prediction(),
+                self.test_reservation_flow(),
+                self.test_sensor_data_endpoint(),
+                self.test_analytics_endpoint(),
+                self.test_optimization_endpoint(),
+                self.test_frontend_accessibility(),
+                return_exceptions=True,
+            )
         
-        # Test WebSocket
+        # Test WebSocket (websocket-client is synchronous)
         self.test_websocket_connection()
         
-        # Test frontend
-        self.test_frontend_accessibility()
-        
         # Generate report
-        self.generate_test_report()
+        return self.generate_test_report()
         
     def generate_test_report(self):
         """Generate test report"""
@@ -376,7 +396,7 @@ def main():
     tester = SmartParkingTester()
     
     print("Checking if backend is running...")
-    if not tester.test_api_health():
+    if not asyncio.run(tester.check_backend()):
         print("❌ Backend is not running. Please start the backend first:")
         print("   cd backend && python -m uvicorn main:app --reload --host 0.0.0.0 --port 8000")
         sys.exit(1)
@@ -384,7 +404,7 @@ def main():
     print("✅ Backend is running. Starting comprehensive tests...")
     
     # Run all tests
-    success = tester.run_comprehensive_test()
+    success = asyncio.run(tester.run_comprehensive_test())
     
     if success:
         print("\n🎉 Integration tests completed successfully!")
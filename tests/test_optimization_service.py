@@ -0,0 +1,38 @@
+"""
+Seeded checks for the placeholder SA-VNS parameters
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from services import optimization_service
+
+
+LOTS = [{"lot_id": "lot_001"}, {"lot_id": "lot_002"}, {"lot_id": "lot_003"}]
+
+# default_rng(42): one pa_i draw per lot, then one rs_i draw per lot
+PINNED = {
+    "lot_001": {"pa_i": 0.83, "rs_i": 0.24},
+    "lot_002": {"pa_i": 0.73, "rs_i": 0.12},
+    "lot_003": {"pa_i": 0.86, "rs_i": 0.3},
+}
+
+
+def test_seeded_parameters_are_pinned():
+    assert optimization_service.simulated_annealing_vns(LOTS, seed=42) == PINNED
+
+
+def test_parameters_stay_in_placeholder_ranges():
+    lots = [{"lot_id": f"lot_{i:03d}"} for i in range(30)]
+    params = optimization_service.simulated_annealing_vns(lots, seed=7)
+    assert len(params) == 30
+    for lot_params in params.values():
+        assert 0.6 <= lot_params["pa_i"] <= 0.9
+        assert 0.1 <= lot_params["rs_i"] <= 0.3
+
+
+def test_lots_without_lot_id_fall_back_to_object_id():
+    params = optimization_service.simulated_annealing_vns([{"_id": "abc"}], seed=1)
+    assert list(params) == ["lot_abc"]